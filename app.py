@@ -1,13 +1,103 @@
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import tempfile
 import os
+import hashlib
+import shutil
+import time
 import sqlite3
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from io import BytesIO
 import zipfile
-from ifc_processor import IFCProcessor
+import gzip
+import re
+from xml.sax.saxutils import escape
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+try:
+    import xxhash  # Optional: much faster content hashing for upload cache keys
+except ImportError:
+    xxhash = None
+from ifc_processor import IFCProcessor, extract_ifc_file
 from database_manager import DatabaseManager
 
+# Buffer size used when streaming uploaded files to disk (8 MiB)
+UPLOAD_COPY_BUFFER_SIZE = 8 * 1024 * 1024
+# Uploads up to this size are written in one go from their memory buffer (16 MiB)
+UPLOAD_DIRECT_WRITE_LIMIT = 16 * 1024 * 1024
+
+# Approval columns of the ifc_objects table
+APPROVAL_COLUMNS = ['ArchitectApproval', 'StructuralApproval']
+# Approval columns of older databases, migrated to APPROVAL_COLUMNS on write-back
+LEGACY_APPROVAL_COLUMNS = frozenset(['approval_architect', 'approval_structure'])
+
+# Compression level of the database and IFC downloads (fast, the files are highly compressible)
+EXPORT_COMPRESS_LEVEL = 3
+# Above this many rows the Excel export is written as plain XML instead of through openpyxl
+EXCEL_XML_EXPORT_ROWS = 200_000
+# Rows converted to XML at a time by the plain XML Excel export
+EXCEL_XML_CHUNK_ROWS = 50_000
+# Key of the zip with all modified IFC files in the IFC export cache (the other keys are file names)
+ALL_IFC_EXPORT_KEY = None
+
+def _ifc_editor_config(user_role):
+    """Column config and disabled columns of the ifc_objects editor for a user role"""
+    # The GUID identifies rows on save and must not be editable
+    disabled_cols = ['IfcGuid']
+    column_config = {
+        'Status': st.column_config.SelectboxColumn(
+            "Status",
+            options=['active', 'deleted'],
+            help="Object status (all users can edit)"
+        )
+    }
+    if user_role == 'architect':
+        column_config['ArchitectApproval'] = st.column_config.CheckboxColumn(
+            "Architect Approval ✓",
+            help="Toggle architect approval (you can edit this)"
+        )
+    else:
+        disabled_cols.append('ArchitectApproval')
+        column_config['ArchitectApproval'] = st.column_config.CheckboxColumn(
+            "Architect Approval (read-only)",
+            help="Only architects can edit this approval"
+        )
+    if user_role == 'structural_engineer':
+        column_config['StructuralApproval'] = st.column_config.CheckboxColumn(
+            "Structural Approval ✓",
+            help="Toggle structural engineer approval (you can edit this)"
+        )
+    else:
+        disabled_cols.append('StructuralApproval')
+        column_config['StructuralApproval'] = st.column_config.CheckboxColumn(
+            "Structural Approval (read-only)",
+            help="Only structural engineers can edit this approval"
+        )
+    return column_config, disabled_cols
+
+# Editor settings per user role, they don't depend on the data
+IFC_EDITOR_CONFIG = {role: _ifc_editor_config(role) for role in ('architect', 'structural_engineer')}
+# Columns shown in the ifc_objects editor, IfcGuid first as the key the edits are saved by
+IFC_EDITOR_COLUMNS = ['IfcGuid', 'Filename', 'BuildingStorey', 'Status'] + APPROVAL_COLUMNS + ['added_date', 'deleted_date']
+
+# Number of rows per page in the generic table editor
+TABLE_PAGE_SIZE = 500
+# Columns with more distinct values than this are filtered by text instead of a multiselect
+FILTER_MULTISELECT_LIMIT = 50
+# Seconds between progress updates while IFC files are loaded into the database
+INGEST_POLL_INTERVAL = 0.2
+# Worker processes parsing uploaded IFC files in parallel (each holds a parsed model in memory while it works)
+INGEST_MAX_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
 # Configure page
 st.set_page_config(
     page_title="IFC File Processor",
@@ -15,25 +105,346 @@ st.set_page_config(
     layout="wide"
 )
 
+def _load_versioned(cached_function, function, *args, **kwargs):
+    """Call cached_function, keyed by the database data version, so it is only recomputed when the database changed.
+    Falls back to calling function uncached if the database has no data version."""
+    data_version = st.session_state.db_manager.get_data_version()
+    if data_version is None:
+        return function(*args, **kwargs)
+    return cached_function(*args, data_version=data_version, **kwargs)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _cached_tables(_db_manager, data_version):
+    """Cached table list, keyed by the database data version"""
+    return _db_manager.get_tables()
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _cached_table_data(_db_manager, table_name, data_version, where=None, contains=None, dtype_backend=None,
+                       limit=None, offset=None):
+    """Cached table content, keyed by table name, filters, page and the database data version"""
+    return _db_manager.get_table_data(table_name, where=where, contains=contains, limit=limit, offset=offset,
+                                      dtype_backend=dtype_backend)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _cached_table_info(_db_manager, table_name, data_version):
+    """Cached table structure and row count, keyed by the database data version"""
+    return _db_manager.get_table_info(table_name)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _cached_row_count(_db_manager, table_name, data_version, where=None, contains=None):
+    """Cached (filtered) row count, keyed by table name, filters and the database data version"""
+    return _db_manager.count_rows(table_name, where=where, contains=contains)
+
+def _with_bool_approvals(df):
+    """Turn the approval columns into real booleans (stored as 1/0, True/False or 'True'/'False')"""
+    for col in APPROVAL_COLUMNS:
+        if col in df.columns and not pd.api.types.is_bool_dtype(df[col]):
+            text = df[col].astype("string[pyarrow]").str.strip().str.lower()
+            df[col] = text.isin(['1', '1.0', 'true']).astype("bool[pyarrow]")
+    return df
+
+def _read_ifc_objects(db_manager, where=None):
+    """Read the (filtered) ifc_objects table with boolean approval columns as an Arrow table"""
+    df = _with_bool_approvals(db_manager.get_table_data('ifc_objects', where=where, dtype_backend="pyarrow"))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _cached_ifc_objects(_db_manager, data_version, where=None):
+    """Cached ifc_objects Arrow table, keyed by the filters and the database data version.
+    Arrow tables are immutable, so one instance can be shared instead of unpickling a copy per read."""
+    return _read_ifc_objects(_db_manager, where)
+
+def load_ifc_objects_table(where=None):
+    """Get the (filtered) ifc_objects table as an Arrow table, reusing the cached one while nothing changed"""
+    return _load_versioned(_cached_ifc_objects, _read_ifc_objects, st.session_state.db_manager, where=where)
+
+def load_ifc_objects(where=None):
+    """Get the (filtered) ifc_objects table with Arrow-backed dtypes and boolean approval columns"""
+    # Wraps the Arrow buffers without copying them
+    return load_ifc_objects_table(where).to_pandas(types_mapper=pd.ArrowDtype)
+
+def ifc_objects_summary(table):
+    """Summary metrics of the ifc_objects table, computed with Arrow compute kernels on the Arrow table"""
+    names = table.column_names
+    summary = {'total': table.num_rows, 'active': table.num_rows, 'deleted': 0, 'files': 1}
+    if 'Status' in names:
+        # One value_counts pass covers both status metrics
+        status_counts = {item['values']: item['counts'] for item in pc.value_counts(table['Status']).to_pylist()}
+        summary['active'] = status_counts.get('active', 0)
+        summary['deleted'] = status_counts.get('deleted', 0)
+    if 'Filename' in names:
+        summary['files'] = pc.count_distinct(table['Filename']).as_py()
+    for col in APPROVAL_COLUMNS:
+        summary[col] = (pc.sum(table[col]).as_py() or 0) if col in names else None
+    return summary
+
+def load_tables():
+    """Get the table list of the current database, reusing the cached result while nothing changed"""
+    return _load_versioned(_cached_tables, DatabaseManager.get_tables, st.session_state.db_manager)
+
+def load_table_data(table_name, where=None, contains=None, dtype_backend=None, limit=None, offset=None):
+    """Get a (filtered) table, or one page of it, reusing the cached DataFrame while nothing changed"""
+    return _load_versioned(_cached_table_data, DatabaseManager.get_table_data, st.session_state.db_manager, table_name,
+                           where=where, contains=contains, dtype_backend=dtype_backend, limit=limit, offset=offset)
+
+def load_table_info(table_name):
+    """Get the columns and row count of a table, reusing the cached result while nothing changed"""
+    return _load_versioned(_cached_table_info, DatabaseManager.get_table_info, st.session_state.db_manager, table_name)
+
+def load_row_count(table_name, where=None, contains=None):
+    """Count the (filtered) rows of a table, reusing the cached count while nothing changed"""
+    return _load_versioned(_cached_row_count, DatabaseManager.count_rows, st.session_state.db_manager, table_name,
+                           where=where, contains=contains)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _cached_column_values(_db_manager, table_name, column, data_version):
+    """Cached distinct column values, keyed by table, column and the database data version"""
+    return _column_filter_values(_db_manager, table_name, column)
+
+def _column_filter_values(db_manager, table_name, column):
+    """Distinct values of a column, or None if there are too many for a multiselect"""
+    # One more than the limit is enough to tell that there are too many
+    values = db_manager.get_distinct_values(table_name, column, limit=FILTER_MULTISELECT_LIMIT + 1)
+    if len(values) > FILTER_MULTISELECT_LIMIT:
+        return None
+    return values
+
+def load_column_values(table_name, column):
+    """Get the distinct values of a table column for the filter widgets (None if there are too many)"""
+    return _load_versioned(_cached_column_values, _column_filter_values, st.session_state.db_manager, table_name, column)
+
+def build_excel_export(df):
+    """Build the Excel export of the ifc_objects table (objects sheet plus summary sheet) as bytes"""
+    # Patch: Ensure static approval columns exist for summary
+    if 'approval_architect' in df.columns and 'ArchitectApproval' not in df.columns:
+        df['ArchitectApproval'] = df['approval_architect']
+    if 'approval_structure' in df.columns and 'StructuralApproval' not in df.columns:
+        df['StructuralApproval'] = df['approval_structure']
+    summary = ifc_objects_summary(pa.Table.from_pandas(_with_bool_approvals(df.copy()), preserve_index=False))
+    summary_rows = [('Total Objects', summary['total']),
+                    ('Active Objects', summary['active']),
+                    ('Deleted Objects', summary['deleted']),
+                    ('Architect Approved', summary['ArchitectApproval'] or 0),
+                    ('Structure Approved', summary['StructuralApproval'] or 0),
+                    ('IFC Files', summary['files'])]
+
+    # Auto-adjust column widths from the longest value per column, measured on the frame instead of per cell
+    widths = []
+    for column in df.columns:
+        value_length = df[column].astype(str).str.len().fillna(0).max() if not df.empty else 0
+        max_length = max(len(str(column)), int(value_length))
+        widths.append(min(max_length + 2, 50))
+
+    if len(df) > EXCEL_XML_EXPORT_ROWS:
+        return _build_excel_xml(df, widths, summary_rows)
+
+    # Write-only workbooks stream the rows to the file instead of keeping a cell object per value in memory
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('IFC_Objects')
+    # In write-only mode the widths have to be set before the first row is written
+    for position, width in enumerate(widths, start=1):
+        worksheet.column_dimensions[get_column_letter(position)].width = width
+    worksheet.append([_excel_header_cell(worksheet, column) for column in df.columns])
+    # Missing values become empty cells
+    for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+        worksheet.append(row)
+
+    # Add a summary sheet
+    summary_sheet = workbook.create_sheet('Summary')
+    summary_sheet.append([_excel_header_cell(summary_sheet, header) for header in ('Metric', 'Count')])
+    for metric, count in summary_rows:
+        summary_sheet.append([metric, count])
+
+    excel_buffer = BytesIO()
+    workbook.save(excel_buffer)
+    return excel_buffer.getvalue()
+
+def _excel_header_cell(worksheet, value):
+    """Bold header cell for a write-only worksheet, like the headers pandas writes"""
+    cell = WriteOnlyCell(worksheet, value=str(value))
+    cell.font = Font(bold=True)
+    return cell
+
+# Minimal package parts of an .xlsx file with the IFC_Objects and Summary sheets
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet2.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="IFC_Objects" sheetId="1" r:id="rId1"/><sheet name="Summary" sheetId="2" r:id="rId2"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet2.xml"/>'
+        '</Relationships>'
+    ),
+}
+XLSX_SHEET_START = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">')
+# Characters that are not allowed in XML 1.0 text
+XML_ILLEGAL_CHARS = r'[\x00-\x08\x0b\x0c\x0e-\x1f]'
+
+def _xlsx_cell(ref, value):
+    """XML of one cell (for the few header and summary cells)"""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    text = escape(re.sub(XML_ILLEGAL_CHARS, '', str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def _xlsx_column_cells(values, column_letter, row_numbers):
+    """XML of the cells of one column, built with vectorized string operations ('' for missing values)"""
+    refs = column_letter + row_numbers
+    if pd.api.types.is_bool_dtype(values.dtype):
+        cells = '<c r="' + refs + '" t="b"><v>' + values.fillna(False).astype('int8').astype(str) + '</v></c>'
+    elif pd.api.types.is_numeric_dtype(values.dtype):
+        cells = '<c r="' + refs + '"><v>' + values.astype(str) + '</v></c>'
+    else:
+        text = (values.astype(str)
+                .str.replace(XML_ILLEGAL_CHARS, '', regex=True)
+                .str.replace('&', '&amp;', regex=False)
+                .str.replace('<', '&lt;', regex=False)
+                .str.replace('>', '&gt;', regex=False))
+        cells = '<c r="' + refs + '" t="inlineStr"><is><t xml:space="preserve">' + text + '</t></is></c>'
+    return cells.where(values.notna().to_numpy(), '')
+
+def _build_excel_xml(df, widths, summary_rows):
+    """Write the Excel export as plain SpreadsheetML into a zip, for tables too large for openpyxl.
+    Rows are converted in chunks with vectorized string operations and streamed into the zip (values only, no styles)."""
+    excel_buffer = BytesIO()
+    column_letters = [get_column_letter(position) for position in range(1, len(df.columns) + 1)]
+    with zipfile.ZipFile(excel_buffer, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=EXPORT_COMPRESS_LEVEL) as xlsx:
+        for name, content in XLSX_PARTS.items():
+            xlsx.writestr(name, content)
+
+        with xlsx.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            cols = ''.join(f'<col min="{position}" max="{position}" width="{width}" customWidth="1"/>'
+                           for position, width in enumerate(widths, start=1))
+            header = ''.join(_xlsx_cell(f'{letter}1', column) for letter, column in zip(column_letters, df.columns))
+            sheet.write(f'{XLSX_SHEET_START}<cols>{cols}</cols><sheetData><row r="1">{header}</row>'.encode('utf-8'))
+            for start in range(0, len(df), EXCEL_XML_CHUNK_ROWS):
+                chunk = df.iloc[start:start + EXCEL_XML_CHUNK_ROWS]
+                row_numbers = pd.Series(range(start + 2, start + 2 + len(chunk)), index=chunk.index).astype(str)
+                rows = '<row r="' + row_numbers + '">'
+                for letter, column in zip(column_letters, chunk.columns):
+                    rows = rows + _xlsx_column_cells(chunk[column], letter, row_numbers)
+                sheet.write((rows + '</row>').str.cat().encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+
+        summary_xml = ''.join(
+            f'<row r="{row}">{_xlsx_cell(f"A{row}", metric)}{_xlsx_cell(f"B{row}", count)}</row>'
+            for row, (metric, count) in enumerate([('Metric', 'Count')] + summary_rows, start=1)
+        )
+        xlsx.writestr('xl/worksheets/sheet2.xml', f'{XLSX_SHEET_START}<sheetData>{summary_xml}</sheetData></worksheet>')
+    return excel_buffer.getvalue()
+
+def _table_excel_export(table):
+    """Build the Excel export of the ifc_objects Arrow table"""
+    return build_excel_export(table.to_pandas(types_mapper=pd.ArrowDtype))
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _cached_excel_export(_table, data_version):
+    """Cached Excel export bytes, keyed by the database data version (bytes are immutable, so they are shared)"""
+    return _table_excel_export(_table)
+
+def load_excel_export():
+    """Get the Excel export of the ifc_objects table, rebuilt only when the database changed (None if empty)"""
+    table = load_ifc_objects_table()
+    if table.num_rows == 0:
+        return None
+    return _load_versioned(_cached_excel_export, _table_excel_export, table)
+
+IFC_FILTER_COLUMNS = ['Status', 'Filename', 'BuildingStorey']
+
+def _ifc_filter_options(df):
+    """Sorted distinct values of the ifc_objects filter columns"""
+    return {
+        column: sorted(set(df[column].dropna().astype(str).unique()))
+        for column in IFC_FILTER_COLUMNS if column in df.columns
+    }
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _cached_ifc_filter_options(_df, data_version):
+    """Cached ifc_objects filter options, keyed by the database data version"""
+    return _ifc_filter_options(_df)
+
+def load_ifc_filter_options(df):
+    """Get the filter options of the ifc_objects table, recomputed only when the database changed"""
+    return _load_versioned(_cached_ifc_filter_options, _ifc_filter_options, df)
+
+@st.cache_data(show_spinner=False)
+def _welcome_markdown(element_type, user_role):
+    """Build the static welcome text once per element type and role"""
+    role_display = "Architect" if user_role == "architect" else "Structural Engineer"
+    return f"""
+        This application tracks **{element_type}** objects from multiple IFC files and manages them with status tracking:
+        
+        - **Upload multiple IFC files** containing {element_type} objects
+        - **Track object status** - automatically detects new and deleted objects between file versions
+        - **Manage approvals** - track architect and structural engineer approvals based on your role
+        - **View history** - see when objects were added or deleted with timestamps from IFC file creation dates
+        - **Export database** - download the complete tracking database
+        
+        **Your role: {role_display}**
+        - You can edit: {role_display} approvals
+        - You can view: All approvals and object status from all trades
+        
+        **Key features:**
+        - Multi-file upload support
+        - Compares new uploads with existing database to detect changes
+        - Uses IFC file timestamps for accurate change tracking
+        - Maintains object lifecycle with active/deleted status management
+        - Role-based approval system for proper workflow management
+        - Unified database tracking across multiple IFC files
+        
+        **Element types supported:**
+        - **IfcVirtualElement**: Openings, provisions for voids
+        - **IfcBuildingElementProxy**: Generic building elements, placeholders    
+        """
+
 def main():
     st.title("🏗️ IFC ProvisionForVoid Tracker")
     st.markdown("Upload and manipulate IFC ProvisionForVoid data files with ease")
     
     # Initialize session state
-    if 'processors' not in st.session_state:
-        st.session_state.processors = {}  # Dictionary to store multiple processors
-    if 'db_manager' not in st.session_state:
-        st.session_state.db_manager = DatabaseManager()  # Initialize once
-    if 'uploaded_files' not in st.session_state:
-        st.session_state.uploaded_files = []  # List of uploaded filenames
-    if 'current_table' not in st.session_state:
-        st.session_state.current_table = None
-    if 'selected_element_type' not in st.session_state:
-        st.session_state.selected_element_type = 'IfcVirtualElement'
-    if 'user_role' not in st.session_state:
-        st.session_state.user_role = 'architect'
-    if 'db_file_path' not in st.session_state:
-        st.session_state.db_file_path = None
+    ss = st.session_state
+    ss.setdefault('ifc_file_paths', {})  # Uploaded filename -> path of its IFC file on disk
+    if 'db_manager' not in ss:
+        ss.db_manager = DatabaseManager()  # Initialize once (kept as a guard so no connection is opened on every rerun)
+    ss.setdefault('uploaded_files', [])  # List of uploaded filenames
+    ss.setdefault('current_table', None)
+    current_element_type = ss.setdefault('selected_element_type', 'IfcVirtualElement')
+    current_role = ss.setdefault('user_role', 'architect')
+    ss.setdefault('db_file_path', None)
 
     # Sidebar for file operations
     with st.sidebar:
@@ -42,13 +453,13 @@ def main():
         user_role = st.selectbox(
             "👤 Select your role:",
             options=["architect", "structural_engineer"],
-            index=0 if st.session_state.user_role == "architect" else 1,
+            index=0 if current_role == "architect" else 1,
             format_func=lambda x: "Architect" if x == "architect" else "Structural Engineer",
             help="Your role determines which approvals you can set in the database"
         )
         
         # Update user role in session state
-        if user_role != st.session_state.user_role:
+        if user_role != current_role:
             st.session_state.user_role = user_role
             st.success(f"Role changed to: {'Architect' if user_role == 'architect' else 'Structural Engineer'}")
         
@@ -58,16 +469,16 @@ def main():
         element_type = st.selectbox(
             "🔧 Choose element type to extract:",
             options=["IfcVirtualElement", "IfcBuildingElementProxy"],
-            index=0 if st.session_state.selected_element_type == "IfcVirtualElement" else 1,
+            index=0 if current_element_type == "IfcVirtualElement" else 1,
             help="Select which type of IFC elements to track in the database"
         )
         
         # Update session state if changed
-        if element_type != st.session_state.selected_element_type:
+        if element_type != current_element_type:
             st.session_state.selected_element_type = element_type
-            # Clear processors to force reprocessing with new element type
+            # Clear the loaded files to force reprocessing with new element type
             if st.session_state.uploaded_files:
-                st.session_state.processors = {}
+                clear_ifc_uploads()
                 st.session_state.uploaded_files = []
                 st.info("Element type changed. Please re-upload your files to process with the new element type.")
 
@@ -75,22 +486,37 @@ def main():
         # Upload existing database file section (now before IFC upload)
         uploaded_db = st.file_uploader(
             "📊 Upload existing SQLite file",
-            type=['db'],
+            type=['db', 'gz'],
             accept_multiple_files=False,
-            help="Upload an existing SQLite database file"
+            help="Upload an existing SQLite database file (.db, or the downloaded .db.gz)"
         )
         if uploaded_db is not None:
-            # Save uploaded DB to a temp file and re-initialize DatabaseManager
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as tmp_db:
-                tmp_db.write(uploaded_db.getvalue())
-                tmp_db_path = tmp_db.name
-            # Re-initialize DatabaseManager with the uploaded DB file
-            st.session_state.db_manager = DatabaseManager(tmp_db_path)
-            st.session_state.db_file_path = tmp_db_path
+            # Only switch databases once per uploaded file, not on every rerun, so the
+            # cached table reads stay valid and later IFC uploads aren't discarded
+            upload_id = getattr(uploaded_db, 'file_id', None) or (uploaded_db.name, uploaded_db.size)
+            if st.session_state.get('uploaded_db_id') != upload_id:
+                # Save uploaded DB to a temp file and re-initialize DatabaseManager
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as tmp_db:
+                    _copy_upload(uploaded_db, tmp_db)
+                    tmp_db_path = tmp_db.name
+                # Re-initialize DatabaseManager with the uploaded DB file
+                st.session_state.db_manager.close()
+                previous_db_path = st.session_state.db_file_path
+                if previous_db_path:
+                    # Include the WAL sidecar files, they may outlive the connection
+                    for path in (previous_db_path, f"{previous_db_path}-wal", f"{previous_db_path}-shm"):
+                        if os.path.exists(path):
+                            os.unlink(path)
+                # The connection pragmas (WAL, synchronous, cache) apply to this session's connection only
+                st.session_state.db_manager = DatabaseManager(tmp_db_path)
+                # Databases from older versions or other tools may lack the indexes of the table view
+                IFCProcessor.create_ifc_objects_indexes(st.session_state.db_manager)
+                st.session_state.db_file_path = tmp_db_path
+                st.session_state.uploaded_db_id = upload_id
+                # Optionally clear uploaded files to avoid mismatch
+                st.session_state.uploaded_files = []
+                clear_ifc_uploads()
             st.success(f"Using uploaded database: {uploaded_db.name}")
-            # Optionally clear uploaded files and processors to avoid mismatch
-            st.session_state.uploaded_files = []
-            st.session_state.processors = {}
 
         # Multiple file upload
         uploaded_files = st.file_uploader(
@@ -101,11 +527,14 @@ def main():
         )
         
         if uploaded_files:
-            # Process new files
+            # Process new files, all at once so they are parsed in parallel
+            new_files = []
             for uploaded_file in uploaded_files:
                 if uploaded_file.name not in st.session_state.uploaded_files:
                     st.session_state.uploaded_files.append(uploaded_file.name)
-                    process_uploaded_file(uploaded_file, uploaded_file.name)
+                    new_files.append(uploaded_file)
+            if new_files:
+                process_uploaded_files(new_files)
             
             # Display uploaded files
             st.markdown("**Uploaded Files:**")
@@ -115,7 +544,7 @@ def main():
             # Add clear all files button
             if st.button("🗑️ Clear All Files"):
                 st.session_state.uploaded_files = []
-                st.session_state.processors = {}
+                clear_ifc_uploads()
                 st.rerun()
 
         # --- Bulk Approve section (before Export) ---
@@ -125,57 +554,30 @@ def main():
         guid_input = st.text_area("Enter GUIDs to approve", value="", height=80, help="Paste or type GUIDs separated by comma, semicolon, or newline.")
         excel_guid_file = st.file_uploader("Or upload Excel file with GUIDs", type=["xlsx"], accept_multiple_files=False, help="Upload an Excel file containing GUIDs to approve. All values in the first sheet will be used.")
         if st.button("✅ Bulk Approve"):
-            import re
-            guid_list = [g.strip() for g in re.split(r'[\n,;]+', guid_input) if g.strip()]
+            # Collect the typed and the Excel GUIDs into one set, which also removes duplicates
+            guids = {g.strip() for g in re.split(r'[\n,;]+', guid_input)}
             # If Excel file uploaded, extract all values from first sheet
             if excel_guid_file is not None:
                 try:
-                    import pandas as pd
                     xls = pd.read_excel(excel_guid_file, sheet_name=0, header=None, dtype=str)
-                    excel_guids = set()
                     for col in xls.columns:
-                        excel_guids.update(xls[col].dropna().astype(str).str.strip())
-                    guid_list.extend(list(excel_guids))
+                        guids.update(xls[col].dropna().str.strip())
                 except Exception as e:
                     st.error(f"Error reading Excel file: {str(e)}")
-            # Deduplicate and remove empty
-            guid_list = list({g for g in guid_list if g})
+            # Remove empty entries
+            guids.discard('')
+            guid_list = list(guids)
             if guid_list:
-                # Get current approval column based on user role, case-insensitive
+                # Approve directly in SQL for the current role (static approval column names)
                 role = st.session_state.user_role
-                df = st.session_state.db_manager.get_table_data('ifc_objects')
-                col_map = {c.lower(): c for c in df.columns}
-                approval_col = None
-                if role == 'architect':
-                    for c in df.columns:
-                        if c.lower() == 'architectapproval':
-                            approval_col = c
-                            break
+                approval_col = 'ArchitectApproval' if role == 'architect' else 'StructuralApproval'
+                updated = st.session_state.db_manager.set_column_value('ifc_objects', approval_col, True, 'IfcGuid', guid_list)
+                if updated is None:
+                    st.error("Failed to approve objects. The database needs the IfcGuid and approval columns.")
+                elif updated > 0:
+                    st.success(f"Approved {updated} object(s) for role: {'Architect' if role == 'architect' else 'Structural Engineer'}.")
                 else:
-                    for c in df.columns:
-                        if c.lower() == 'structuralapproval':
-                            approval_col = c
-                            break
-                guid_col = None
-                for c in df.columns:
-                    if c.lower() == 'ifcguid':
-                        guid_col = c
-                        break
-                if approval_col and guid_col:
-                    # Update approval for matching GUIDs
-                    updated = 0
-                    for guid in guid_list:
-                        idx = df[df[guid_col] == guid].index
-                        if not idx.empty:
-                            df.loc[idx, approval_col] = True
-                            updated += len(idx)
-                    if updated > 0:
-                        st.session_state.db_manager.update_table_data('ifc_objects', df)
-                        st.success(f"Approved {updated} object(s) for role: {'Architect' if role == 'architect' else 'Structural Engineer'}.")
-                    else:
-                        st.warning("No matching GUIDs found in the database.")
-                else:
-                    st.error("Database does not contain the required columns (IfcGuid and approval column).")
+                    st.warning("No matching GUIDs found in the database.")
             else:
                 st.warning("No valid GUIDs entered or found in Excel file.")
 
@@ -183,115 +585,80 @@ def main():
         st.markdown("---")
         st.subheader("Write Approvals to IFC & Download")
         st.markdown("Update the approval state in the original IFC files and download the modified versions.")
-        if st.session_state.uploaded_files:
-            for filename in st.session_state.uploaded_files:
-                if filename in st.session_state.processors:
-                    processor = st.session_state.processors[filename]
+        tracked_files = st.session_state.uploaded_files
+        ifc_file_paths = st.session_state.ifc_file_paths
+        if tracked_files:
+            for filename in tracked_files:
+                ifc_path = ifc_file_paths.get(filename)
+                if ifc_path is not None:
                     if st.button(f"✍️ Write Approvals & Download for {filename}", key=f"write_ifc_{filename}"):
                         try:
-                            # Ensure only new static approval columns are present for write-back
-                            df = st.session_state.db_manager.get_table_data('ifc_objects')
-                            changed = False
-                            # Copy old to new if needed (for migration)
-                            if 'approval_architect' in df.columns and 'ArchitectApproval' not in df.columns:
-                                df['ArchitectApproval'] = df['approval_architect']
-                                changed = True
-                            if 'approval_structure' in df.columns and 'StructuralApproval' not in df.columns:
-                                df['StructuralApproval'] = df['approval_structure']
-                                changed = True
-                            # Remove old columns if present
-                            drop_cols = []
-                            if 'approval_architect' in df.columns:
-                                drop_cols.append('approval_architect')
-                            if 'approval_structure' in df.columns:
-                                drop_cols.append('approval_structure')
-                            if drop_cols:
-                                df = df.drop(columns=drop_cols)
-                                changed = True
-                            if changed:
-                                st.session_state.db_manager.update_table_data('ifc_objects', df)
-                            # Update IFC from database
-                            processor.update_ifc_from_database(st.session_state.db_manager)
-                            # Get the modified IFC content
-                            ifc_content = processor.get_ifc_content()
-                            if ifc_content:
-                                # Fix filename: insert _modified before extension
-                                import os
-                                base, ext = os.path.splitext(filename)
-                                download_name = f"{base}_modified{ext if ext else '.ifc'}"
-                                st.download_button(
-                                    label=f"📥 Download Modified IFC: {filename}",
-                                    data=ifc_content,
-                                    file_name=download_name,
-                                    mime="application/octet-stream",
-                                    help="Download the IFC file with updated approvals"
-                                )
+                            migrate_legacy_approval_columns()
+                            # Update IFC from database and write the modified IFC to a zip on disk
+                            zip_path = get_modified_ifc_zip_path(filename, ifc_path)
+                            if zip_path:
+                                download_name = f"{os.path.splitext(modified_ifc_name(filename))[0]}.zip"
+                                # Serve the file handle instead of holding the model bytes in session state
+                                with open(zip_path, 'rb') as zip_file:
+                                    st.download_button(
+                                        label=f"📥 Download Modified IFC: {filename}",
+                                        data=zip_file,
+                                        file_name=download_name,
+                                        mime="application/zip",
+                                        help="Download the IFC file with updated approvals (zip compressed)"
+                                    )
                             else:
                                 st.error(f"Failed to generate modified IFC for {filename}")
                         except Exception as e:
                             st.error(f"Error writing approvals to IFC for {filename}: {str(e)}")
+            # One zip with all modified files instead of one download per file
+            loaded_files = {filename: ifc_file_paths[filename] for filename in tracked_files if filename in ifc_file_paths}
+            if len(loaded_files) > 1:
+                if st.button("✍️ Write Approvals & Download All", key="write_ifc_all"):
+                    try:
+                        migrate_legacy_approval_columns()
+                        zip_path = get_all_modified_ifcs_zip_path(loaded_files)
+                        if zip_path:
+                            with open(zip_path, 'rb') as zip_file:
+                                st.download_button(
+                                    label="📥 Download All Modified IFCs",
+                                    data=zip_file,
+                                    file_name="modified_ifcs.zip",
+                                    mime="application/zip",
+                                    help="Download all IFC files with updated approvals in one zip"
+                                )
+                        else:
+                            st.error("Failed to generate the modified IFC files")
+                    except Exception as e:
+                        st.error(f"Error writing approvals to the IFC files: {str(e)}")
         else:
             st.info("No IFC files uploaded to write approvals.")
 
         # --- Export section at the bottom ---
         st.markdown("---")
         st.subheader("Export")
-        # .db download button (single, using st.download_button)
-        db_content = st.session_state.db_manager.get_database_content()
-        st.download_button(
-            label="📊 Download Database (.db)",
-            data=db_content,
-            file_name="ifc_data.db",
-            mime="application/octet-stream",
-            help="Download the SQLite database containing the extracted IFC data"
-        )
+        # .db download button (single, using st.download_button), served from the on-disk snapshot
+        db_export_path = get_database_export_path()
+        if db_export_path:
+            with open(db_export_path, 'rb') as db_file:
+                st.download_button(
+                    label="📊 Download Database (.db.gz)",
+                    data=db_file,
+                    file_name="ifc_data.db.gz",
+                    mime="application/gzip",
+                    help="Download the SQLite database containing the extracted IFC data"
+                )
+        else:
+            st.error("Failed to prepare database for download")
         # Excel download button (streamlined, always visible)
-        # Generate Excel in memory and show download button
+        # The workbook is only rebuilt when the database changed
         try:
-            import pandas as pd
-            df = st.session_state.db_manager.get_table_data('ifc_objects')
-            if not df.empty:
-                # Patch: Ensure static approval columns exist for summary
-                if 'approval_architect' in df.columns and 'ArchitectApproval' not in df.columns:
-                    df['ArchitectApproval'] = df['approval_architect']
-                if 'approval_structure' in df.columns and 'StructuralApproval' not in df.columns:
-                    df['StructuralApproval'] = df['approval_structure']
-                excel_buffer = BytesIO()
-                with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                    df.to_excel(writer, sheet_name='IFC_Objects', index=False)
-                    # Auto-adjust column widths
-                    worksheet = writer.sheets['IFC_Objects']
-                    for column in worksheet.columns:
-                        max_length = 0
-                        column_letter = column[0].column_letter
-                        for cell in column:
-                            try:
-                                if len(str(cell.value)) > max_length:
-                                    max_length = len(str(cell.value))
-                            except:
-                                pass
-                        adjusted_width = min(max_length + 2, 50)
-                        worksheet.column_dimensions[column_letter].width = adjusted_width
-                    # Add a summary sheet
-                    summary_data = {
-                        'Metric': ['Total Objects', 'Active Objects', 'Deleted Objects', 
-                                  'Architect Approved', 'Structure Approved', 'IFC Files'],
-                        'Count': [
-                            len(df),
-                            len(df[df['status'] == 'active']) if 'status' in df.columns else len(df),
-                            len(df[df['status'] == 'deleted']) if 'status' in df.columns else 0,
-                            len(df[df['ArchitectApproval'] == True]) if 'ArchitectApproval' in df.columns else 0,
-                            len(df[df['StructuralApproval'] == True]) if 'StructuralApproval' in df.columns else 0,
-                            df['filename'].nunique() if 'filename' in df.columns else 1
-                        ]
-                    }
-                    summary_df = pd.DataFrame(summary_data)
-                    summary_df.to_excel(writer, sheet_name='Summary', index=False)
-                excel_buffer.seek(0)
+            excel_bytes = load_excel_export()
+            if excel_bytes:
                 filename = "ifc_database.xlsx"
                 st.download_button(
                     label="📋 Download Database as Excel (.xlsx)",
-                    data=excel_buffer.getvalue(),
+                    data=excel_bytes,
                     file_name=filename,
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     help="Download the database as an Excel spreadsheet for easy review"
@@ -306,34 +673,8 @@ def main():
         # Welcome screen
         st.info("👆 Please upload IFC files containing ProvisionForVoids to get started")
         
-        role_display = "Architect" if st.session_state.user_role == "architect" else "Structural Engineer"
-        
         st.markdown("### About this tool")
-        st.markdown(f"""
-        This application tracks **{st.session_state.selected_element_type}** objects from multiple IFC files and manages them with status tracking:
-        
-        - **Upload multiple IFC files** containing {st.session_state.selected_element_type} objects
-        - **Track object status** - automatically detects new and deleted objects between file versions
-        - **Manage approvals** - track architect and structural engineer approvals based on your role
-        - **View history** - see when objects were added or deleted with timestamps from IFC file creation dates
-        - **Export database** - download the complete tracking database
-        
-        **Your role: {role_display}**
-        - You can edit: {'Architect' if st.session_state.user_role == 'architect' else 'Structural Engineer'} approvals
-        - You can view: All approvals and object status from all trades
-        
-        **Key features:**
-        - Multi-file upload support
-        - Compares new uploads with existing database to detect changes
-        - Uses IFC file timestamps for accurate change tracking
-        - Maintains object lifecycle with active/deleted status management
-        - Role-based approval system for proper workflow management
-        - Unified database tracking across multiple IFC files
-        
-        **Element types supported:**
-        - **IfcVirtualElement**: Openings, provisions for voids
-        - **IfcBuildingElementProxy**: Generic building elements, placeholders    
-        """)
+        st.markdown(_welcome_markdown(st.session_state.selected_element_type, st.session_state.user_role))
         
     else:
         # Show file processing interface
@@ -363,75 +704,170 @@ def main():
         st.session_state.ifc_writeback_param_arch = param_arch
         st.session_state.ifc_writeback_param_struct = param_struct
 
-def process_uploaded_file(uploaded_file, original_filename):
-    """Process the uploaded IFC file"""
+def _copy_upload(uploaded_file, target_file):
+    """Write an uploaded file to an open file without making an extra in-memory copy.
+    Gzip-compressed uploads (.gz, e.g. the database download) are decompressed on the way."""
+    if uploaded_file.name.lower().endswith('.gz'):
+        uploaded_file.seek(0)
+        with gzip.open(uploaded_file, 'rb') as gzip_file:
+            shutil.copyfileobj(gzip_file, target_file, length=UPLOAD_COPY_BUFFER_SIZE)
+    elif uploaded_file.size <= UPLOAD_DIRECT_WRITE_LIMIT:
+        # getbuffer() exposes the upload's memory directly, unlike getvalue()
+        with uploaded_file.getbuffer() as buffer:
+            target_file.write(buffer)
+    else:
+        uploaded_file.seek(0)
+        shutil.copyfileobj(uploaded_file, target_file, length=UPLOAD_COPY_BUFFER_SIZE)
+
+def _hash_upload(uploaded_file):
+    """Content hash of an uploaded file, used as cache key (not for security)"""
+    with uploaded_file.getbuffer() as buffer:
+        if xxhash is not None:
+            return xxhash.xxh3_64(buffer).hexdigest()
+        return hashlib.sha1(buffer).hexdigest()
+
+@st.cache_resource
+def _get_ingest_executor():
+    """Worker processes that parse uploaded IFC files, parsing is CPU-bound and runs in parallel this way"""
+    # Spawned workers only import ifc_processor, forking the multi-threaded server process isn't safe
+    return ProcessPoolExecutor(max_workers=INGEST_MAX_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+
+def _store_ifc_upload(uploaded_file):
+    """Write an uploaded IFC file to a temporary file and return its path.
+    The file belongs to this session and is removed again by clear_ifc_uploads."""
+    # Stream the upload into a temporary file instead of copying it into memory first
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".ifc") as tmp_file:
+        try:
+            _copy_upload(uploaded_file, tmp_file)
+        except Exception:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+    return tmp_file.name
+
+def _set_ifc_file_path(filename, ifc_path):
+    """Keep the temporary IFC file of an uploaded file, removing the one of an earlier upload under that name"""
+    previous_path = st.session_state.ifc_file_paths.get(filename)
+    if previous_path and previous_path != ifc_path and os.path.exists(previous_path):
+        os.unlink(previous_path)
+    st.session_state.ifc_file_paths[filename] = ifc_path
+
+def clear_ifc_uploads():
+    """Remove the temporary IFC files of this session's uploads and the zips written from them"""
+    for ifc_path in st.session_state.get('ifc_file_paths', {}).values():
+        if os.path.exists(ifc_path):
+            os.unlink(ifc_path)
+    st.session_state.ifc_file_paths = {}
+    clear_ifc_exports()
+
+@st.cache_resource(show_spinner=False, max_entries=3)
+def _load_ifc_processor(ifc_path, session_key):
+    """Parse an IFC file for the write-back once, repeated downloads reuse the model.
+    The write-back edits the model, so every session gets its own, with a lock for its write-backs.
+    Only the last few models stay in memory, evicted ones are parsed again from disk when needed."""
+    return IFCProcessor(ifc_path), threading.Lock()
+
+def process_uploaded_files(uploaded_files):
+    """Process the uploaded IFC files: parse them in parallel worker processes, then merge their objects into the database"""
     try:
-        with st.spinner("Processing IFC file..."):
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".ifc") as tmp_file:
-                tmp_file.write(uploaded_file.getvalue())
-                tmp_file_path = tmp_file.name
+        with st.spinner("Processing IFC files..."):
+            db_manager = st.session_state.db_manager
+            element_type = st.session_state.selected_element_type
+            if 'ingested_files' not in st.session_state:
+                st.session_state.ingested_files = {}
 
-            # Initialize processor for this file
-            processor = IFCProcessor(tmp_file_path)
+            # Reset the database with the first file if no DB was uploaded and these are the first IFC files
+            reset_db = (st.session_state.db_file_path is None) and \
+                (len(st.session_state.uploaded_files) == len(uploaded_files))
 
-            # Determine if we need to reset the database (no DB uploaded and this is the first IFC file)
-            uploaded_files_count = len(st.session_state.uploaded_files)
-            reset_db = (st.session_state.db_file_path is None) and (uploaded_files_count == 1)
+            executor = _get_ingest_executor()
+            pending = []
+            for uploaded_file in uploaded_files:
+                filename = uploaded_file.name
+                file_hash = _hash_upload(uploaded_file)
 
+                # The same content was already loaded into this database under this name (e.g. re-added after
+                # clearing the file list), loading it again would not change anything
+                ingest_key = (file_hash, element_type, db_manager.db_path)
+                if not reset_db and st.session_state.ingested_files.get(filename) == ingest_key:
+                    if filename not in st.session_state.ifc_file_paths:
+                        _set_ifc_file_path(filename, _store_ifc_upload(uploaded_file))
+                    st.success(f"✅ '{filename}' is already loaded in the database")
+                    continue
 
-            # Get existing GUIDs in the database
-            try:
-                existing_df = st.session_state.db_manager.get_table_data('ifc_objects')
-                existing_guids = set(existing_df['guid']) if 'guid' in existing_df.columns else set()
-            except Exception:
-                existing_guids = set()
-
-            # Patch the processor to filter out objects with duplicate GUIDs before adding
-            def filter_duplicate_guids(objects):
-                # objects: list of dicts or DataFrame
-                if isinstance(objects, pd.DataFrame):
-                    return objects[~objects['guid'].isin(existing_guids)]
-                elif isinstance(objects, list):
-                    return [obj for obj in objects if obj.get('guid') not in existing_guids]
-                return objects
-
-            # Monkey-patch processor to filter duplicates before DB insert (if supported)
-            if hasattr(processor, 'preprocess_objects'):
-                orig_preprocess = processor.preprocess_objects
-                def new_preprocess(objects):
-                    filtered = filter_duplicate_guids(objects)
-                    return orig_preprocess(filtered)
-                processor.preprocess_objects = new_preprocess
-            elif hasattr(processor, 'objects_to_add'):
-                processor.objects_to_add = filter_duplicate_guids(processor.objects_to_add)
-
-            # Process the file with selected element type and original filename
-            success = processor.load_ifc_to_database(
-                st.session_state.db_manager,
-                st.session_state.selected_element_type,
-                original_filename,
-                reset_database=reset_db
-            )
+                ifc_path = _store_ifc_upload(uploaded_file)
+                pending.append((filename, ifc_path, ingest_key, executor.submit(extract_ifc_file, ifc_path, element_type)))
 
-            # Store processor for this file
-            if success:
-                st.session_state.processors[original_filename] = processor
+            # Poll the workers, so the page keeps updating while large models are parsed
+            if pending:
+                progress_text = f"Extracting objects from {len(pending)} IFC file(s)..."
+                progress_bar = st.progress(0.0, text=progress_text)
+                while not all(future.done() for *_, future in pending):
+                    done = sum(future.done() for *_, future in pending)
+                    progress_bar.progress(done / len(pending), text=progress_text)
+                    time.sleep(INGEST_POLL_INTERVAL)
+                progress_bar.empty()
 
-            if success:
-                st.success(f"✅ Successfully processed '{uploaded_file.name}'")
-            else:
-                st.error(f"❌ Failed to process '{uploaded_file.name}'")
+            # Merge the files in upload order, with this session's connection as the only writer
+            pool_broken = False
+            for filename, ifc_path, ingest_key, future in pending:
+                try:
+                    ifc_creation_date, objects = future.result()
+                except BrokenProcessPool as e:
+                    # A crashed worker (e.g. out of memory) breaks the pool, shut it down and start a new one next time
+                    if not pool_broken:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        _get_ingest_executor.clear()
+                        pool_broken = True
+                    os.unlink(ifc_path)
+                    st.error(f"❌ Failed to process '{filename}': {str(e)}")
+                    continue
+                except Exception as e:
+                    os.unlink(ifc_path)
+                    st.error(f"❌ Failed to process '{filename}': {str(e)}")
+                    continue
 
-            # Clean up temporary file
-            os.unlink(tmp_file_path)
+                success = IFCProcessor.store_objects(db_manager, filename, ifc_creation_date, objects,
+                                                     reset_database=reset_db)
+                # Keep only the path for this file, the model is loaded again for the write-back
+                if success:
+                    _set_ifc_file_path(filename, ifc_path)
+                    if reset_db:
+                        # Files loaded before the reset are no longer in the database
+                        st.session_state.ingested_files = {}
+                        reset_db = False
+                    st.session_state.ingested_files[filename] = ingest_key
+                    st.success(f"✅ Successfully processed '{filename}'")
+                else:
+                    os.unlink(ifc_path)
+                    st.error(f"❌ Failed to process '{filename}'")
 
     except Exception as e:
         st.error(f"Error processing file: {str(e)}")
 
+def rerun_fragment():
+    """Rerun only the current fragment; falls back to a full rerun when the fragment runs as part of the page"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def rerun_with_message(message):
+    """Rerun the whole page after the database changed, so the sidebar exports are rebuilt from the new data.
+    The message is shown above the table after the rerun."""
+    st.session_state.status_message = message
+    st.rerun()
+
+@st.fragment
 def display_file_interface():
-    """Display the main interface for file manipulation"""
+    """Display the main interface for file manipulation.
+    Runs as a fragment, so filtering and editing only rerun this part of the page."""
     
+    # Result of a save or purge that reran the page
+    status_message = st.session_state.pop('status_message', None)
+    if status_message:
+        st.success(status_message)
+
     # File information
     col1, col2 = st.columns([2, 1])
     
@@ -439,6 +875,7 @@ def display_file_interface():
         st.subheader(f"📄 IFC Database ({len(st.session_state.uploaded_files)} files)")
     
     with col2:
+        # Rerun the whole page, so the sidebar exports are refreshed along with the table
         if st.button("🔄 Refresh Data"):
             st.rerun()
     
@@ -449,7 +886,8 @@ def display_file_interface():
     
     # Get the main ifc_objects table
     try:
-        df = st.session_state.db_manager.get_table_data('ifc_objects')
+        table = load_ifc_objects_table()
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
         # Small number input above the table for row limit, less wide
         row_col, cap_col = st.columns([1, 5])
         with row_col:
@@ -460,55 +898,31 @@ def display_file_interface():
                 value=50,
                 step=10,
                 key="row_limit_input",
-                help="Set how many rows to show in the main table (for performance)",
+                help="Set how many rows to show per page of the main table (for performance)",
                 label_visibility="collapsed"
             )
         with cap_col:
-            st.caption(f"Rows shown: {row_limit} (change above)")
-        # Limit display to user-selected number of rows
-        display_df = df.head(row_limit) if not df.empty else df
+            st.caption(f"Rows per page: {row_limit} (change above)")
         
-        if display_df.empty:
+        if df.empty:
             st.info(f"No IFC objects found. Make sure your IFC file contains {element_type} objects.")
         else:
-            # Display summary statistics (use full df for stats)
+            # Display summary statistics (over the full table)
             col1, col2, col3, col4, col5, col6 = st.columns(6)
-            with col1:
-                if 'Status' in df.columns:
-                    active_count = len(df[df['Status'] == 'active'])
-                else:
-                    active_count = len(df)
-                st.metric("Active Objects", active_count)
-            with col2:
-                if 'Status' in df.columns:
-                    deleted_count = len(df[df['Status'] == 'deleted'])
-                else:
-                    deleted_count = 0
-                st.metric("Deleted Objects", deleted_count)
-            with col3:
-                if 'Filename' in df.columns:
-                    total_files = df['Filename'].nunique()
-                else:
-                    total_files = 1
-                st.metric("IFC Files", total_files)
-            with col4:
-                st.metric("Total Records", len(df))
+            summary = ifc_objects_summary(table)
+            col1.metric("Active Objects", summary['active'])
+            col2.metric("Deleted Objects", summary['deleted'])
+            col3.metric("IFC Files", summary['files'])
+            col4.metric("Total Records", summary['total'])
             # Use static approval column names as defined in the database
-            arch_col = 'ArchitectApproval'
-            struct_col = 'StructuralApproval'
-            if arch_col in df.columns:
-                arch_approved = df[arch_col].apply(lambda v: (isinstance(v, bool) and v) or (isinstance(v, (int, float)) and v == 1) or (isinstance(v, str) and v.strip().lower() == 'true')).sum()
-                col5.metric(f"{arch_col} Approved", int(arch_approved))
-            else:
-                col5.metric(f"{arch_col} Approved", "N/A")
-            if struct_col in df.columns:
-                struct_approved = df[struct_col].apply(lambda v: (isinstance(v, bool) and v) or (isinstance(v, (int, float)) and v == 1) or (isinstance(v, str) and v.strip().lower() == 'true')).sum()
-                col6.metric(f"{struct_col} Approved", int(struct_approved))
-            else:
-                col6.metric(f"{struct_col} Approved", "N/A")
+            for col, approval_col in zip((col5, col6), APPROVAL_COLUMNS):
+                if summary[approval_col] is not None:
+                    col.metric(f"{approval_col} Approved", summary[approval_col])
+                else:
+                    col.metric(f"{approval_col} Approved", "N/A")
             
             # Display the table (user-selected number of rows)
-            display_ifc_objects_table(display_df)
+            display_ifc_objects_table(df, row_limit)
 
         # --- Big Picture Approval Overview per Building Storey ---
         st.markdown('---')
@@ -518,9 +932,12 @@ def display_file_interface():
             col_map = {c.lower(): c for c in df.columns}
             required_cols = ['buildingstorey', 'architectapproval', 'structuralapproval', 'status']
             if all(col in col_map for col in required_cols):
-                # Exclude deleted objects (case-insensitive)
+                # Exclude deleted objects (case-insensitive); the mask selects new rows, active_df is only read
                 status_col = col_map['status']
-                active_df = df[df[status_col].str.lower() != 'deleted'].copy() if df[status_col].dtype == object else df[df[status_col] != 'deleted'].copy()
+                if pd.api.types.is_string_dtype(df[status_col]):
+                    active_df = df[(df[status_col].str.lower() != 'deleted').fillna(True)]
+                else:
+                    active_df = df[df[status_col] != 'deleted']
                 # Determine unique identifier column for counting objects
                 if 'guid' in col_map:
                     count_col = col_map['guid']
@@ -569,13 +986,14 @@ def display_file_interface():
                 header_cols[2].markdown("**Architect Approved**")
                 header_cols[3].markdown("**Structure Approved**")
                 header_cols[4].markdown("**Percent Approved**")
-                for _, row in grouped.iterrows():
+                overview_rows = grouped[['Storey', 'Total', 'Architect Approved', 'Structure Approved', 'Percent Approved']]
+                for storey, total, arch_approved, struct_approved, percent in overview_rows.itertuples(index=False, name=None):
                     col1, col2, col3, col4, col5 = st.columns([2,1,2,2,3])
-                    col1.markdown(f"**{row['Storey']}**")
-                    col2.markdown(f"{int(row['Total'])}")
-                    col3.markdown(f"{int(row['Architect Approved'])}")
-                    col4.markdown(f"{int(row['Structure Approved'])}")
-                    col5.markdown(percent_bar(row['Percent Approved']), unsafe_allow_html=True)
+                    col1.markdown(f"**{storey}**")
+                    col2.markdown(f"{int(total)}")
+                    col3.markdown(f"{int(arch_approved)}")
+                    col4.markdown(f"{int(struct_approved)}")
+                    col5.markdown(percent_bar(percent), unsafe_allow_html=True)
             else:
                 st.info('Not enough data to show approval overview per building storey. Required columns: BuildingStorey, ArchitectApproval, StructuralApproval, status.')
         except Exception as e:
@@ -584,15 +1002,15 @@ def display_file_interface():
     except Exception as e:
         st.error(f"Error loading IFC objects: {str(e)}")
         # Fallback to show available tables
-        tables = st.session_state.db_manager.get_tables()
+        tables = load_tables()
         if tables:
             st.markdown("### Available Tables")
             selected_table = st.selectbox("Choose a table:", options=tables)
             if selected_table:
                 display_table_data(selected_table)
 
-def display_ifc_objects_table(df):
-    """Display and allow editing of the main ifc_objects table"""
+def display_ifc_objects_table(df, row_limit):
+    """Display and allow editing of the main ifc_objects table (first row_limit matching rows)"""
     try:
         st.markdown("#### Edit Object Status and Approvals")
         st.markdown("You can edit the status and approval columns directly in the table below.")
@@ -600,32 +1018,22 @@ def display_ifc_objects_table(df):
         # Filter options
         with st.expander("🔍 Filter Options"):
             col1, col2, col3, col4 = st.columns(4)
+            # Option lists only change with the database, not with every widget interaction
+            filter_options = load_ifc_filter_options(df)
 
             with col1:
                 # Status filter (static column name 'Status')
-                if 'Status' in df.columns:
-                    status_values = df['Status'].dropna().astype(str).unique()
-                    status_options = ['All'] + sorted(set(status_values))
-                else:
-                    status_options = ['All']
+                status_options = ['All'] + filter_options.get('Status', [])
                 selected_status = st.selectbox("Filter by Status:", status_options)
 
             with col2:
                 # Filename filter (static column name 'Filename')
-                if 'Filename' in df.columns:
-                    filename_values = df['Filename'].dropna().astype(str).unique()
-                    filename_options = ['All'] + sorted(set(filename_values))
-                else:
-                    filename_options = ['All']
+                filename_options = ['All'] + filter_options.get('Filename', [])
                 selected_filename = st.selectbox("Filter by File:", filename_options)
 
             with col3:
                 # BuildingStorey filter (static column name 'BuildingStorey')
-                if 'BuildingStorey' in df.columns:
-                    storey_values = df['BuildingStorey'].dropna().astype(str).unique()
-                    storey_options = ['All'] + sorted(set(storey_values))
-                else:
-                    storey_options = ['All']
+                storey_options = ['All'] + filter_options.get('BuildingStorey', [])
                 selected_storey = st.selectbox("Filter by Building Storey:", storey_options)
 
             with col4:
@@ -633,62 +1041,45 @@ def display_ifc_objects_table(df):
                 if 'added_timestamp' in df.columns:
                     show_date_filter = st.checkbox("Filter by Date Range")
 
-        # Apply filters
-        filtered_df = df.copy()
+        # Apply filters in SQL, so only the matching rows are read from the database
+        where = {}
+        for column, selected in (('Status', selected_status), ('Filename', selected_filename),
+                                 ('BuildingStorey', selected_storey)):
+            if selected != 'All' and column in df.columns:
+                where[column] = [selected]
+        matching_df = load_ifc_objects(where) if where else df
 
-        if selected_status != 'All' and 'Status' in df.columns:
-            filtered_df = filtered_df[filtered_df['Status'].astype(str) == str(selected_status)]
-
-        if selected_filename != 'All' and 'Filename' in df.columns:
-            filtered_df = filtered_df[filtered_df['Filename'].astype(str) == str(selected_filename)]
-
-        if 'BuildingStorey' in df.columns and selected_storey != 'All':
-            filtered_df = filtered_df[filtered_df['BuildingStorey'].astype(str) == str(selected_storey)]
+        # Only send one page of row_limit rows to the browser
+        page_count = max(1, -(-len(matching_df) // row_limit))
+        page = 1
+        if page_count > 1:
+            page = st.number_input(
+                "Page",
+                min_value=1,
+                max_value=page_count,
+                value=1,
+                step=1,
+                key="ifc_objects_page",
+                help=f"{row_limit} rows per page"
+            )
+        page_start = (page - 1) * row_limit
+        # Only the known columns go to the editor, extra columns of uploaded databases are left out
+        view_columns = [col for col in IFC_EDITOR_COLUMNS if col in matching_df.columns]
+        filtered_df = matching_df.iloc[page_start:page_start + row_limit][view_columns]
+        # One editor state per filter selection and page, so edits are never applied to the rows of another
+        # (the editor tracks edits by row position, and every filter's first page has the same positions)
+        editor_key = f"ifc_objects_editor_{hash(tuple(sorted((column, tuple(values)) for column, values in where.items())))}_{page}"
         
         # Display filtered data
         if not filtered_df.empty:
-            # Configure columns based on user role
-            column_config = {}
-            disabled_cols = ['guid']  # GUID should not be editable
+            # Configure columns based on user role (built once at import, see IFC_EDITOR_CONFIG)
             user_role = st.session_state.user_role
+            column_config, disabled_cols = IFC_EDITOR_CONFIG.get(user_role, IFC_EDITOR_CONFIG['structural_engineer'])
 
             # Show role-based info
             role_display = "Architect" if user_role == "architect" else "Structural Engineer"
             st.info(f"👤 Logged in as: **{role_display}** - You can edit {role_display.lower()} approvals")
 
-            if 'ArchitectApproval' in filtered_df.columns:
-                if user_role == 'architect':
-                    column_config['ArchitectApproval'] = st.column_config.CheckboxColumn(
-                        "Architect Approval ✓",
-                        help="Toggle architect approval (you can edit this)"
-                    )
-                else:
-                    disabled_cols.append('ArchitectApproval')
-                    column_config['ArchitectApproval'] = st.column_config.CheckboxColumn(
-                        "Architect Approval (read-only)",
-                        help="Only architects can edit this approval"
-                    )
-
-            if 'StructuralApproval' in filtered_df.columns:
-                if user_role == 'structural_engineer':
-                    column_config['StructuralApproval'] = st.column_config.CheckboxColumn(
-                        "Structural Approval ✓", 
-                        help="Toggle structural engineer approval (you can edit this)"
-                    )
-                else:
-                    disabled_cols.append('StructuralApproval')
-                    column_config['StructuralApproval'] = st.column_config.CheckboxColumn(
-                        "Structural Approval (read-only)",
-                        help="Only structural engineers can edit this approval"
-                    )
-
-            if 'status' in filtered_df.columns:
-                column_config['status'] = st.column_config.SelectboxColumn(
-                    "Status",
-                    options=['active', 'deleted'],
-                    help="Object status (all users can edit)"
-                )
-
             # Data editor
             edited_df = st.data_editor(
                 filtered_df,
@@ -696,14 +1087,14 @@ def display_ifc_objects_table(df):
                 disabled=disabled_cols,
                 column_config=column_config,
                 hide_index=True,
-                key="ifc_objects_editor"
+                key=editor_key
             )
 
             # Save and Purge buttons in line with a spacer
             btn_col1, btn_spacer, btn_col2 = st.columns([2, 0.2, 2])
             with btn_col1:
                 if st.button("💾 Save Changes to Database", type="primary"):
-                    save_ifc_objects_changes(edited_df)
+                    save_ifc_objects_changes(edited_df, filtered_df, editor_key)
             with btn_spacer:
                 st.write("")  # Spacer for visual separation
             with btn_col2:
@@ -714,97 +1105,163 @@ def display_ifc_objects_table(df):
                             cursor = conn.cursor()
                             cursor.execute("DELETE FROM ifc_objects WHERE status = 'deleted'")
                             conn.commit()
-                        st.success("All deleted objects have been purged from the database.")
-                        st.rerun()
+                        rerun_with_message("All deleted objects have been purged from the database.")
                     except Exception as e:
                         st.error(f"Error purging deleted objects: {str(e)}")
 
             # Show record count
-            st.caption(f"Showing {len(filtered_df)} of {len(df)} total records")
+            st.caption(f"Page {page} of {page_count}: rows {page_start + 1}-{page_start + len(filtered_df)} "
+                       f"of {len(matching_df)} matching records ({len(df)} total)")
         else:
             st.info("No records match the current filters.")
             
     except Exception as e:
         st.error(f"Error displaying IFC objects table: {str(e)}")
 
-def save_ifc_objects_changes(edited_df):
-    """Save changes to the ifc_objects table"""
+def _changed_cells(before, after):
+    """Boolean frame of the cells that differ between two aligned frames (values differ unless they are equal or both missing)"""
+    return ~((before == after).fillna(False).astype(bool) | (before.isna() & after.isna()))
+
+def save_ifc_objects_changes(edited_df, original_df, editor_key=None):
+    """Save changes to the ifc_objects table (only rows whose status or approvals changed)"""
     try:
+        # The editor state lists the rows the user touched; nothing touched means nothing to write
+        edited_rows = st.session_state.get(editor_key, {}).get('edited_rows') if editor_key else None
+        if edited_rows is not None:
+            if not edited_rows:
+                st.info("No changes to save.")
+                return
+            edited_df = edited_df.iloc[sorted(int(position) for position in edited_rows)]
+
         with st.spinner("Saving changes to database..."):
-            success = st.session_state.db_manager.update_table_data('ifc_objects', edited_df)
+            columns = [col for col in ['Status'] + APPROVAL_COLUMNS if col in edited_df.columns]
+            edited = edited_df[columns]
+            original = original_df.loc[edited_df.index, columns]
+            changed = _changed_cells(original, edited)
+            changed_rows = edited_df[changed.any(axis=1)]
+            if changed_rows.empty:
+                st.info("No changes to save.")
+                return
+
+            updates = changed_rows[['IfcGuid'] + columns].to_dict('records')
+            success = st.session_state.db_manager.apply_row_changes('ifc_objects', 'IfcGuid', updates, [], [])
             
             if success:
-                st.success("✅ Changes saved successfully!")
+                rerun_with_message(f"✅ Changes saved successfully! ({len(updates)} rows updated)")
             else:
                 st.error("❌ Failed to save changes")
     
     except Exception as e:
         st.error(f"Error saving changes: {str(e)}")
 
+def _is_numeric_sql_type(declared_type):
+    """Whether a declared SQLite column type has integer, real or numeric affinity"""
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return True
+    if not declared_type or any(text in declared_type for text in ('CHAR', 'CLOB', 'TEXT', 'BLOB')):
+        return False
+    return True
+
 def display_table_data(table_name):
-    """Display and allow editing of table data"""
+    """Display and allow editing of table data (read one page at a time)"""
     try:
-        # Get table data
-        df = st.session_state.db_manager.get_table_data(table_name)
+        # Columns and row count come from the schema and COUNT(*), the rows themselves are only read per page
+        table_info = load_table_info(table_name)
+        total_rows = table_info.get('row_count', 0)
+        columns = [column['name'] for column in table_info.get('columns', [])]
         
-        if df.empty:
+        if total_rows == 0:
             st.info(f"No data found in table '{table_name}'")
             return
         
         st.markdown(f"### 📊 {table_name}")
-        st.markdown(f"**Records found:** {len(df)}")
+        st.markdown(f"**Records found:** {total_rows}")
         
         # Display table statistics
         with st.expander("📈 Table Statistics"):
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Total Records", len(df))
+                st.metric("Total Records", total_rows)
             with col2:
-                st.metric("Columns", len(df.columns))
+                st.metric("Columns", len(columns))
             with col3:
-                numeric_cols = df.select_dtypes(include=['number']).columns
-                st.metric("Numeric Columns", len(numeric_cols))
+                numeric_count = sum(_is_numeric_sql_type(column['type']) for column in table_info['columns'])
+                st.metric("Numeric Columns", numeric_count)
         
         # Data editing interface
         st.markdown("#### Edit Data")
         
         # Option to filter data
-        if len(df) > 100:
+        where = None
+        contains = None
+        if total_rows > 100:
             st.info("💡 Large dataset detected. Use filters to focus on specific records.")
             
             # Add simple filtering
             if st.checkbox("Enable Filtering"):
-                filter_column = st.selectbox("Filter by column:", df.columns)
+                filter_column = st.selectbox("Filter by column:", columns)
                 if filter_column:
-                    unique_values = df[filter_column].unique()
-                    if len(unique_values) > 50:
+                    unique_values = load_column_values(table_name, filter_column)
+                    if unique_values is None:
                         filter_value = st.text_input(f"Filter {filter_column} contains:")
                         if filter_value:
-                            df = df[df[filter_column].astype(str).str.contains(filter_value, case=False, na=False)]
+                            # Let SQLite do the filtering instead of masking the full table in pandas
+                            contains = {filter_column: filter_value}
                     else:
                         filter_values = st.multiselect(f"Select {filter_column} values:", unique_values)
                         if filter_values:
-                            df = df[df[filter_column].isin(filter_values)]
+                            where = {filter_column: list(filter_values)}
+        matching_rows = load_row_count(table_name, where, contains) if where or contains else total_rows
         
         # Data editor
-        if not df.empty:
-            edited_df = st.data_editor(
-                df,
+        if matching_rows:
+            # Only read and send one page of rows to the browser
+            page_count = max(1, -(-matching_rows // TABLE_PAGE_SIZE))
+            page = 1
+            if page_count > 1:
+                page = st.number_input(
+                    "Page",
+                    min_value=1,
+                    max_value=page_count,
+                    value=1,
+                    step=1,
+                    key=f"page_{table_name}",
+                    help=f"{TABLE_PAGE_SIZE} rows per page"
+                )
+                st.caption(f"Page {page} of {page_count}")
+            page_start = (page - 1) * TABLE_PAGE_SIZE
+            page_end = page_start + TABLE_PAGE_SIZE
+            # Arrow-backed: smaller for the string-heavy IFC tables
+            original_page = load_table_data(table_name, where=where, contains=contains, dtype_backend="pyarrow",
+                                            limit=TABLE_PAGE_SIZE, offset=page_start)
+
+            edited_page = st.data_editor(
+                original_page,
                 use_container_width=True,
+                column_config=get_column_config(table_name, original_page),
                 num_rows="dynamic",
-                disabled=["GlobalId"] if "GlobalId" in df.columns else None,
-                help="Edit the data directly in the table. Changes will be saved to the database."
+                disabled=["GlobalId"] if "GlobalId" in columns else False
             )
+            st.caption("Edit the data directly in the table. Changes will be saved to the database.")
             
             # Save changes button
             col1, col2 = st.columns([1, 4])
             with col1:
                 if st.button("💾 Save Changes", type="primary"):
-                    save_table_changes(table_name, edited_df)
+                    key_column = _get_row_key_column(original_page)
+                    if key_column:
+                        # Only write the rows that were changed, added or deleted on this page
+                        save_table_changes(table_name, edited_page, original_df=original_page, key_column=key_column)
+                    else:
+                        # Without a key the whole table is rewritten, put the edited page back in place of the original rows
+                        df = load_table_data(table_name, where=where, contains=contains, dtype_backend="pyarrow")
+                        edited_df = pd.concat([df.iloc[:page_start], edited_page, df.iloc[page_end:]])
+                        save_table_changes(table_name, edited_df)
             
             with col2:
                 if st.button("↩️ Reset to Original"):
-                    st.rerun()
+                    rerun_fragment()
         
         else:
             st.info("No records match the current filters.")
@@ -812,63 +1269,251 @@ def display_table_data(table_name):
     except Exception as e:
         st.error(f"Error displaying table data: {str(e)}")
 
-def save_table_changes(table_name, edited_df):
-    """Save changes back to the database"""
+def _column_config_for(dtype):
+    """Map a pandas dtype to a typed Streamlit column (None lets Streamlit decide)"""
+    if pd.api.types.is_bool_dtype(dtype):
+        return st.column_config.CheckboxColumn()
+    if pd.api.types.is_numeric_dtype(dtype):
+        return st.column_config.NumberColumn()
+    if pd.api.types.is_string_dtype(dtype):
+        return st.column_config.TextColumn()
+    return None
+
+def get_column_config(table_name, df):
+    """Get the typed column config for a table, built once per table schema"""
+    if 'col_configs' not in st.session_state:
+        st.session_state.col_configs = {}
+    schema = tuple((col, str(dtype)) for col, dtype in df.dtypes.items())
+    cached = st.session_state.col_configs.get(table_name)
+    if cached and cached[0] == schema:
+        return cached[1]
+
+    config = {}
+    for col, dtype in df.dtypes.items():
+        column = _column_config_for(dtype)
+        if column is not None:
+            config[col] = column
+    st.session_state.col_configs[table_name] = (schema, config)
+    return config
+
+def _get_row_key_column(df):
+    """Find a column that identifies rows (GlobalId or IfcGuid), if its values are unique"""
+    for col in ['GlobalId', 'IfcGuid']:
+        if col in df.columns and df[col].notna().all() and df[col].is_unique:
+            return col
+    return None
+
+def _diff_rows(original_df, edited_df, key_column):
+    """Compare an edited table with its original by key column.
+    Returns (updates, inserts, deletes) for DatabaseManager.apply_row_changes."""
+    original = original_df.set_index(key_column, drop=False)
+    edited_keys = edited_df[key_column]
+    has_key = edited_keys.notna()
+
+    # Rows without a key or with a key that wasn't there before are new
+    is_new = ~has_key | ~edited_keys.isin(original.index)
+    inserts = [
+        {col: value for col, value in row.items() if not pd.isna(value)}
+        for row in edited_df[is_new].to_dict('records')
+    ]
+    # Rows added but left empty have nothing to insert
+    inserts = [row for row in inserts if row]
+    deletes = list(original.index.difference(edited_keys[has_key]))
+
+    updates = []
+    kept = edited_df[~is_new]
+    # Adding a row in the editor turns every column into object dtype, cast back so the values and the
+    # key index compare with the (e.g. Arrow-backed) original
+    kept = kept.astype({col: dtype for col, dtype in original_df.dtypes.items() if col in kept.columns})
+    kept = kept.set_index(key_column, drop=False)
+    if not kept.empty:
+        before = original.loc[kept.index, kept.columns]
+        changed = _changed_cells(before, kept)
+        # Walk the changed cells on the boolean matrix instead of building a Series per row
+        changed_cells = changed.to_numpy()
+        changed_rows = changed_cells.any(axis=1)
+        for key, row_changed in zip(changed.index[changed_rows], changed_cells[changed_rows]):
+            update = {key_column: key}
+            for col in changed.columns[row_changed]:
+                update[col] = kept.at[key, col]
+            updates.append(update)
+
+    return updates, inserts, deletes
+
+def save_table_changes(table_name, edited_df, original_df=None, key_column=None):
+    """Save changes back to the database.
+    If the original rows and a key column are given, only the differences are written."""
     try:
         with st.spinner("Saving changes..."):
-            success = st.session_state.db_manager.update_table_data(table_name, edited_df)
+            if original_df is not None and key_column:
+                updates, inserts, deletes = _diff_rows(original_df, edited_df, key_column)
+                if not (updates or inserts or deletes):
+                    st.info("No changes to save.")
+                    return
+                success = st.session_state.db_manager.apply_row_changes(table_name, key_column, updates, inserts, deletes)
+            else:
+                success = st.session_state.db_manager.update_table_data(table_name, edited_df)
             
             if success:
-                st.success("✅ Changes saved successfully!")
-                # Update the IFC model
-                st.session_state.processor.update_ifc_from_database(st.session_state.db_manager)
+                # The IFC model is updated lazily on the next download
+                rerun_with_message("✅ Changes saved successfully!")
             else:
                 st.error("❌ Failed to save changes")
     
     except Exception as e:
         st.error(f"Error saving changes: {str(e)}")
 
+def migrate_legacy_approval_columns():
+    """Copy the old approval_architect/approval_structure columns to the static approval columns and drop them"""
+    # Check the schema on the cached table first, the frame is only needed when there is something to migrate
+    if not LEGACY_APPROVAL_COLUMNS.intersection(load_ifc_objects_table().column_names):
+        return
+    df = load_ifc_objects()
+    changed = False
+    # Copy old to new if needed (for migration)
+    if 'approval_architect' in df.columns and 'ArchitectApproval' not in df.columns:
+        df['ArchitectApproval'] = df['approval_architect']
+        changed = True
+    if 'approval_structure' in df.columns and 'StructuralApproval' not in df.columns:
+        df['StructuralApproval'] = df['approval_structure']
+        changed = True
+    # Remove old columns if present
+    drop_cols = []
+    if 'approval_architect' in df.columns:
+        drop_cols.append('approval_architect')
+    if 'approval_structure' in df.columns:
+        drop_cols.append('approval_structure')
+    if drop_cols:
+        df = df.drop(columns=drop_cols)
+        changed = True
+    if changed:
+        st.session_state.db_manager.update_table_data('ifc_objects', df)
+
+def modified_ifc_name(filename):
+    """File name of the modified version of an IFC file (_modified before the extension)"""
+    base, ext = os.path.splitext(filename)
+    return f"{base}_modified{ext if ext else '.ifc'}"
+
+def get_modified_ifc_zip_path(filename, ifc_path):
+    """Write the approvals from the database into the IFC model and return the path of a zip with the modified file.
+    The zip is kept per IFC file and only rewritten when the database or the write-back settings changed."""
+    return _get_modified_ifcs_zip_path(filename, {filename: ifc_path})
+
+def get_all_modified_ifcs_zip_path(ifc_paths):
+    """Like get_modified_ifc_zip_path, but one zip with the modified versions of all given IFC files"""
+    return _get_modified_ifcs_zip_path(ALL_IFC_EXPORT_KEY, ifc_paths)
+
+def _get_modified_ifcs_zip_path(export_key, ifc_paths):
+    """Write the approvals into the models of the IFC files ({filename: path}) and zip the modified files"""
+    db_manager = st.session_state.db_manager
+    pset_name = st.session_state.get('ifc_writeback_pset')
+    param_arch = st.session_state.get('ifc_writeback_param_arch')
+    param_struct = st.session_state.get('ifc_writeback_param_struct')
+    session_key = st.session_state.setdefault('session_key', uuid.uuid4().hex)
+    data_version = db_manager.get_data_version()
+
+    if 'ifc_export_cache' not in st.session_state:
+        st.session_state.ifc_export_cache = {}
+    cache_key = (data_version, pset_name, param_arch, param_struct, tuple(ifc_paths.items()))
+    cached = st.session_state.ifc_export_cache.get(export_key)
+    if data_version is not None and cached and cached[0] == cache_key and os.path.exists(cached[1]):
+        return cached[1]
+
+    if cached:
+        zip_path = cached[1]
+    else:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp_zip:
+            zip_path = tmp_zip.name
+    # IFC is STEP text and compresses several times over, a fast level is enough
+    written = True
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=EXPORT_COMPRESS_LEVEL) as ifc_zip:
+        for filename, ifc_path in ifc_paths.items():
+            processor, write_lock = _load_ifc_processor(ifc_path, session_key)
+            with write_lock:
+                processor.update_ifc_from_database(db_manager, pset_name, param_arch, param_struct)
+                ifc_path = processor.write_ifc_file()
+            if not ifc_path:
+                written = False
+                break
+            try:
+                ifc_zip.write(ifc_path, arcname=modified_ifc_name(filename))
+            finally:
+                os.unlink(ifc_path)
+    if not written:
+        st.session_state.ifc_export_cache.pop(export_key, None)
+        os.unlink(zip_path)
+        return None
+
+    st.session_state.ifc_export_cache[export_key] = (cache_key, zip_path)
+    return zip_path
+
+def clear_ifc_exports():
+    """Remove the written IFC zips of all files"""
+    for _, zip_path in st.session_state.get('ifc_export_cache', {}).values():
+        if os.path.exists(zip_path):
+            os.unlink(zip_path)
+    st.session_state.ifc_export_cache = {}
+
 def download_modified_ifc():
     """Provide download link for modified IFC file"""
     try:
         with st.spinner("Preparing IFC file for download..."):
-            # Update IFC from database
-            st.session_state.processor.update_ifc_from_database(st.session_state.db_manager)
-            
-            # Get the modified IFC content
-            ifc_content = st.session_state.processor.get_ifc_content()
+            # Update IFC from database (only if it changed) and write the modified IFC to a zip on disk
+            original_name = st.session_state.uploaded_file_name
+            zip_path = get_modified_ifc_zip_path(original_name, st.session_state.processor.ifc_file_path)
             
-            if ifc_content:
+            if zip_path:
                 # Create download
-                original_name = st.session_state.uploaded_file_name
-                new_name = f"modified_{original_name}"
+                new_name = f"{os.path.splitext(modified_ifc_name(original_name))[0]}.zip"
                 
-                st.download_button(
-                    label="📥 Download Modified IFC",
-                    data=ifc_content,
-                    file_name=new_name,
-                    mime="application/octet-stream",
-                    help="Download the IFC file with your modifications applied"
-                )
+                with open(zip_path, 'rb') as zip_file:
+                    st.download_button(
+                        label="📥 Download Modified IFC",
+                        data=zip_file,
+                        file_name=new_name,
+                        mime="application/zip",
+                        help="Download the IFC file with your modifications applied (zip compressed)"
+                    )
             else:
                 st.error("Failed to generate modified IFC file")
     
     except Exception as e:
         st.error(f"Error preparing download: {str(e)}")
 
+def get_database_export_path():
+    """Get the path of a gzip-compressed on-disk snapshot of the database for download.
+    The snapshot is reused and only rewritten when the database changed."""
+    db_manager = st.session_state.db_manager
+    data_version = db_manager.get_data_version()
+    export = st.session_state.get('db_export')
+    if export and data_version is not None and export[0] == data_version and os.path.exists(export[2]):
+        return export[2]
+
+    export_path = db_manager.export_database_file(export[1] if export else None)
+    if not export_path:
+        st.session_state.db_export = None
+        return None
+    # SQLite pages compress well, the download is a fraction of the database size
+    gzip_path = f"{export_path}.gz"
+    with open(export_path, 'rb') as db_file, gzip.open(gzip_path, 'wb', compresslevel=EXPORT_COMPRESS_LEVEL) as gzip_file:
+        shutil.copyfileobj(db_file, gzip_file, length=UPLOAD_COPY_BUFFER_SIZE)
+    st.session_state.db_export = (data_version, export_path, gzip_path)
+    return gzip_path
+
 def download_database():
     """Provide download link for SQLite database"""
     try:
-        db_content = st.session_state.db_manager.get_database_content()
+        db_export_path = get_database_export_path()
         
-        if db_content:
-            st.download_button(
-                label="📊 Download Database",
-                data=db_content,
-                file_name="ifc_data.db",
-                mime="application/octet-stream",
-                help="Download the SQLite database containing the extracted IFC data"
-            )
+        if db_export_path:
+            with open(db_export_path, 'rb') as db_file:
+                st.download_button(
+                    label="📊 Download Database",
+                    data=db_file,
+                    file_name="ifc_data.db.gz",
+                    mime="application/gzip",
+                    help="Download the SQLite database containing the extracted IFC data"
+                )
         else:
             st.error("Failed to prepare database for download")
     
@@ -879,56 +1524,13 @@ def download_excel_database():
     """Export database to Excel and provide download link"""
     try:
         with st.spinner("Converting database to Excel format..."):
-            # Get the ifc_objects data
-            df = st.session_state.db_manager.get_table_data('ifc_objects')
+            # Build (or reuse) the Excel file for the current data
+            excel_bytes = load_excel_export()
             
-            if df.empty:
+            if not excel_bytes:
                 st.warning("No data found in database to export")
                 return
             
-            # Create Excel file in memory
-            from io import BytesIO
-            excel_buffer = BytesIO()
-            
-            # Write DataFrame to Excel
-            with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='IFC_Objects', index=False)
-                
-                # Get the workbook and worksheet
-                workbook = writer.book
-                worksheet = writer.sheets['IFC_Objects']
-                
-                # Auto-adjust column widths
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-                
-                # Add a summary sheet with statistics
-                summary_data = {
-                    'Metric': ['Total Objects', 'Active Objects', 'Deleted Objects', 
-                              'Architect Approved', 'Structure Approved', 'IFC Files'],
-                    'Count': [
-                        len(df),
-                        len(df[df['status'] == 'active']) if 'status' in df.columns else len(df),
-                        len(df[df['status'] == 'deleted']) if 'status' in df.columns else 0,
-                        len(df[df['approval_architect'] == True]) if 'approval_architect' in df.columns else 0,
-                        len(df[df['approval_structure'] == True]) if 'approval_structure' in df.columns else 0,
-                        df['filename'].nunique() if 'filename' in df.columns else 1
-                    ]
-                }
-                summary_df = pd.DataFrame(summary_data)
-                summary_df.to_excel(writer, sheet_name='Summary', index=False)
-            
-            excel_buffer.seek(0)
-            
             # Generate filename based on current timestamp
             from datetime import datetime
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -936,13 +1538,13 @@ def download_excel_database():
             
             st.download_button(
                 label="📋 Download Excel File",
-                data=excel_buffer.getvalue(),
+                data=excel_bytes,
                 file_name=filename,
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 help="Download the database as an Excel spreadsheet for easy review"
             )
             
-            st.success(f"✅ Excel file ready for download ({len(df)} records)")
+            st.success(f"✅ Excel file ready for download ({load_ifc_objects_table().num_rows} records)")
     
     except Exception as e:
         st.error(f"Error creating Excel file: {str(e)}")
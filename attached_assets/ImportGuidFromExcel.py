@@ -1,5 +1,5 @@
 # Imports IfcGUIDs from an excel file to set the approval status in the database
-import pandas as pd
+from openpyxl import load_workbook
 import sqlite3
 
 # Define the path to the Excel file containing GUIDs
@@ -26,8 +26,10 @@ try:
     # Read GUIDs from the Excel file
     try:
         # Assuming the Excel has no header and GUIDs are in the first column (index 0)
-        approved_guids_df = pd.read_excel(csv_file_path, header=None) # Changed to read_excel
-        approved_guids = approved_guids_df[0].tolist() # Assuming GUIDs are in the first column
+        # A read-only workbook streams the rows instead of loading every cell of the sheet
+        wb = load_workbook(csv_file_path, read_only=True, data_only=True)
+        approved_guids = [row[0] for row in wb.active.iter_rows(min_col=1, max_col=1, values_only=True) if row[0] is not None]
+        wb.close()
         print(f"Read {len(approved_guids)} GUIDs from {csv_file_path}")
 
     except FileNotFoundError:
@@ -41,13 +43,12 @@ try:
     conn = sqlite3.connect(db_filename)
     c = conn.cursor()
 
-    updated_count = 0
-    # Iterate through the approved GUIDs and update the database
-    for guid in approved_guids:
-        # Check if the GUID exists in the database and update the approval status
-        # Using a parameterized query to prevent SQL injection
-        c.execute(f"UPDATE ifc_objects SET {approval_column} = TRUE WHERE guid = ?", (guid,))
-        updated_count += c.rowcount # Check if any row was updated
+    # Load the GUIDs into a temporary table and update all matching objects with one set-based UPDATE,
+    # instead of one UPDATE statement per GUID
+    c.execute("CREATE TEMP TABLE tmp_guids (guid TEXT PRIMARY KEY)")
+    c.executemany("INSERT OR IGNORE INTO tmp_guids VALUES (?)", [(guid,) for guid in approved_guids])
+    c.execute(f"UPDATE ifc_objects SET {approval_column} = TRUE WHERE guid IN (SELECT guid FROM tmp_guids)")
+    updated_count = c.rowcount
 
     # Commit the changes
     conn.commit()
@@ -2,9 +2,23 @@ import sqlite3
 import pandas as pd
 import tempfile
 import os
-from typing import List, Dict, Any, Optional
+import itertools
+import functools
+import re
+from typing import Iterable, List, Dict, Any, Optional
 import logging
 
+# Characters not allowed in table and column names (anything but letters, digits and underscores)
+INVALID_NAME_CHARS = re.compile(r'\W')
+# Rows per multi-row INSERT statement in insert_rows
+INSERT_BATCH_ROWS = 500
+# Bound parameters allowed per statement (SQLITE_MAX_VARIABLE_NUMBER of SQLite before 3.32)
+SQLITE_MAX_VARIABLES = 999
+
+def _casefold(value):
+    """casefold() SQL function for case-insensitive text matching (NULL stays NULL)"""
+    return value.casefold() if isinstance(value, str) else value
+
 class DatabaseManager:
     """Manages SQLite database operations for IFC data"""
     
@@ -17,8 +31,18 @@ class DatabaseManager:
     def _connect(self):
         """Establish database connection"""
         try:
+            # No sqlite3.Row row factory: every reader accesses columns by position, and pandas
+            # would otherwise convert a Row object per row back into a tuple
             self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.connection.row_factory = sqlite3.Row  # Enable column access by name
+            # WAL lets readers run alongside a writer; with WAL, synchronous=NORMAL only syncs on checkpoint
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute("PRAGMA temp_store=MEMORY")
+            self.connection.execute("PRAGMA cache_size=-65536")  # 64 MiB page cache
+            # Read pages through a memory map instead of read() calls (256 MiB)
+            self.connection.execute("PRAGMA mmap_size=268435456")
+            # SQLite's LOWER only folds ASCII, the contains filter needs Unicode case folding (e.g. Ä/ä)
+            self.connection.create_function("casefold", 1, _casefold, deterministic=True)
             logging.info("Database connection established")
         except Exception as e:
             logging.error(f"Failed to connect to database: {str(e)}")
@@ -53,39 +77,53 @@ class DatabaseManager:
             logging.error(f"Error creating table {table_name}: {str(e)}")
             return False
     
-    def insert_rows(self, table_name: str, columns: Dict[str, str], rows: List[Dict[str, Any]]) -> bool:
-        """Insert multiple rows into a table"""
+    def insert_rows(self, table_name: str, columns: Dict[str, str], rows: Iterable[Dict[str, Any]]) -> bool:
+        """Insert multiple rows into a table. rows can be a generator, it is consumed while inserting."""
         try:
-            if not self.connection or not rows:
+            if not self.connection:
+                return False
+            rows = iter(rows)
+            first_row = next(rows, None)
+            if first_row is None:
                 return False
             
             safe_table_name = self._sanitize_table_name(table_name)
             safe_columns = [self._sanitize_column_name(col) for col in columns.keys()]
             
-            # Prepare INSERT statement
-            placeholders = ', '.join(['?' for _ in safe_columns])
-            insert_sql = f"INSERT OR REPLACE INTO {safe_table_name} ({', '.join(safe_columns)}) VALUES ({placeholders})"
-            
-            # Prepare row data
-            row_data = []
-            for row in rows:
-                row_values = []
-                for col in columns.keys():
-                    value = row.get(col)
-                    # Handle None values and convert complex types to strings
-                    if value is None:
-                        row_values.append(None)
-                    elif isinstance(value, (list, dict, tuple)):
-                        row_values.append(str(value))
-                    else:
-                        row_values.append(value)
-                row_data.append(row_values)
+            # Prepare INSERT statement; each statement inserts a batch of rows with a multi-row VALUES clause,
+            # which saves a statement execution per row (within the bound-parameter limit)
+            placeholders = f"({', '.join(['?' for _ in safe_columns])})"
+            insert_sql = f"INSERT OR REPLACE INTO {safe_table_name} ({', '.join(safe_columns)}) VALUES "
+            rows_per_statement = max(1, min(INSERT_BATCH_ROWS, SQLITE_MAX_VARIABLES // len(safe_columns)))
+            batch_sql = insert_sql + ', '.join([placeholders] * rows_per_statement)
             
-            cursor = self.connection.cursor()
-            cursor.executemany(insert_sql, row_data)
-            self.connection.commit()
+            # Stream the row values in batches instead of building a list of all rows first;
+            # complex types are stored as strings
+            column_names = tuple(columns.keys())
+            row_values = (
+                str(value) if isinstance(value, (list, dict, tuple)) else value
+                for row in itertools.chain([first_row], rows)
+                for value in map(row.get, column_names)
+            )
+            batch_size = rows_per_statement * len(column_names)
             
-            logging.info(f"Inserted {len(rows)} rows into {safe_table_name}")
+            # One transaction for all rows, committed on success and rolled back on error
+            inserted = 0
+            with self.connection:
+                # Take the write lock up front instead of upgrading from a read lock on the first insert
+                if not self.connection.in_transaction:
+                    self.connection.execute("BEGIN IMMEDIATE")
+                while True:
+                    batch = list(itertools.islice(row_values, batch_size))
+                    if not batch:
+                        break
+                    batch_rows = len(batch) // len(column_names)
+                    # The last batch is usually shorter and gets its own statement
+                    sql = batch_sql if batch_rows == rows_per_statement else insert_sql + ', '.join([placeholders] * batch_rows)
+                    self.connection.execute(sql, batch)
+                    inserted += batch_rows
+            
+            logging.info(f"Inserted {inserted} rows into {safe_table_name}")
             return True
         
         except Exception as e:
@@ -99,7 +137,8 @@ class DatabaseManager:
                 return []
             
             cursor = self.connection.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
+            # Leave out SQLite's internal tables (e.g. sqlite_stat1 created by ANALYZE)
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
             tables = [row[0] for row in cursor.fetchall()]
             
             return tables
@@ -108,22 +147,96 @@ class DatabaseManager:
             logging.error(f"Error getting tables: {str(e)}")
             return []
     
-    def get_table_data(self, table_name: str) -> pd.DataFrame:
-        """Get all data from a table as a pandas DataFrame"""
+    def get_table_data(self, table_name: str, where: Optional[Dict[str, Any]] = None,
+                       contains: Optional[Dict[str, str]] = None, limit: Optional[int] = None,
+                       offset: Optional[int] = None, dtype_backend: Optional[str] = None) -> pd.DataFrame:
+        """Get data from a table as a pandas DataFrame.
+        where maps columns to a value (or list of values) that must match exactly,
+        contains maps columns to a text that must be contained (case-insensitive).
+        limit and offset restrict the returned rows. Filtering is done in SQL.
+        dtype_backend='pyarrow' returns Arrow-backed columns instead of numpy/object ones."""
         try:
             if not self.connection:
                 return pd.DataFrame()
-            
+
             safe_table_name = self._sanitize_table_name(table_name)
             query = f"SELECT * FROM {safe_table_name}"
-            
-            df = pd.read_sql_query(query, self.connection)
+
+            where_sql, params = self._build_where_clause(where, contains)
+            query += where_sql
+            if limit is not None or offset is not None:
+                query += " LIMIT ? OFFSET ?"
+                params.extend([limit if limit is not None else -1, offset or 0])
+
+            if dtype_backend:
+                df = pd.read_sql_query(query, self.connection, params=params, dtype_backend=dtype_backend)
+            else:
+                df = pd.read_sql_query(query, self.connection, params=params)
             return df
         
         except Exception as e:
             logging.error(f"Error getting data from table {table_name}: {str(e)}")
             return pd.DataFrame()
     
+    def count_rows(self, table_name: str, where: Optional[Dict[str, Any]] = None,
+                   contains: Optional[Dict[str, str]] = None) -> int:
+        """Count the rows of a table, with the same filters as get_table_data"""
+        try:
+            if not self.connection:
+                return 0
+
+            safe_table_name = self._sanitize_table_name(table_name)
+            where_sql, params = self._build_where_clause(where, contains)
+            cursor = self.connection.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM {safe_table_name}{where_sql}", params)
+            return cursor.fetchone()[0]
+
+        except Exception as e:
+            logging.error(f"Error counting rows of table {table_name}: {str(e)}")
+            return 0
+
+    def get_distinct_values(self, table_name: str, column: str, limit: Optional[int] = None) -> List[Any]:
+        """Get the distinct values of a column (at most limit of them)"""
+        try:
+            if not self.connection:
+                return []
+
+            safe_table_name = self._sanitize_table_name(table_name)
+            safe_column = self._sanitize_column_name(column)
+            cursor = self.connection.cursor()
+            cursor.execute(f"SELECT DISTINCT {safe_column} FROM {safe_table_name} LIMIT ?",
+                           (limit if limit is not None else -1,))
+            return [row[0] for row in cursor.fetchall()]
+
+        except Exception as e:
+            logging.error(f"Error getting distinct values of {column} in table {table_name}: {str(e)}")
+            return []
+
+    def get_column_values(self, table_name: str, columns: List[str]) -> Dict[str, List[Any]]:
+        """Get the values of some columns of all rows as plain lists, without building a DataFrame.
+        Columns that don't exist in the table are left out of the result."""
+        try:
+            if not self.connection:
+                return {}
+
+            safe_table_name = self._sanitize_table_name(table_name)
+            cursor = self.connection.cursor()
+            cursor.execute(f"PRAGMA table_info({safe_table_name})")
+            existing_columns = {row[1] for row in cursor.fetchall()}
+            selected = [col for col in columns if col in existing_columns]
+            if not selected:
+                return {}
+
+            cursor.execute(f"SELECT {', '.join(self._sanitize_column_name(col) for col in selected)} FROM {safe_table_name}")
+            rows = cursor.fetchall()
+            # Transpose the row tuples into one list per column
+            values = list(zip(*rows)) if rows else [()] * len(selected)
+            return {col: list(column_values) for col, column_values in zip(selected, values)}
+
+        except Exception as e:
+            logging.error(f"Error getting columns from table {table_name}: {str(e)}")
+            return {}
+
     def update_table_data(self, table_name: str, df: pd.DataFrame) -> bool:
         """Update table data with DataFrame content"""
         try:
@@ -132,13 +245,10 @@ class DatabaseManager:
             
             safe_table_name = self._sanitize_table_name(table_name)
             
-            # Clear existing data
-            cursor = self.connection.cursor()
-            cursor.execute(f"DELETE FROM {safe_table_name}")
-            
-            # Insert updated data
-            df.to_sql(safe_table_name, self.connection, if_exists='append', index=False)
-            self.connection.commit()
+            # Clear and refill in one transaction so a failed insert does not leave the table empty
+            with self.connection:
+                self.connection.execute(f"DELETE FROM {safe_table_name}")
+                df.to_sql(safe_table_name, self.connection, if_exists='append', index=False)
             
             logging.info(f"Updated {len(df)} rows in {safe_table_name}")
             return True
@@ -147,6 +257,79 @@ class DatabaseManager:
             logging.error(f"Error updating table {table_name}: {str(e)}")
             return False
     
+    def apply_row_changes(self, table_name: str, key_column: str, updates: List[Dict[str, Any]],
+                          inserts: List[Dict[str, Any]], deletes: List[Any]) -> bool:
+        """Apply row-level changes in one transaction instead of rewriting the whole table.
+        updates contain the key column plus the changed columns, inserts are complete rows,
+        deletes are key values."""
+        try:
+            if not self.connection:
+                return False
+
+            safe_table_name = self._sanitize_table_name(table_name)
+            safe_key_column = self._sanitize_column_name(key_column)
+            cursor = self.connection.cursor()
+            # Take the write lock up front so all changes land in one transaction
+            if not self.connection.in_transaction:
+                cursor.execute("BEGIN IMMEDIATE")
+
+            # Group updates by their set of changed columns so each group is one executemany
+            update_groups = {}
+            for row in updates:
+                columns = tuple(col for col in row.keys() if col != key_column)
+                if columns:
+                    update_groups.setdefault(columns, []).append(
+                        [self._to_sql_value(row[col]) for col in columns] + [self._to_sql_value(row[key_column])]
+                    )
+            for columns, params in update_groups.items():
+                set_sql = ', '.join(f"{self._sanitize_column_name(col)} = ?" for col in columns)
+                cursor.executemany(f"UPDATE {safe_table_name} SET {set_sql} WHERE {safe_key_column} = ?", params)
+
+            if deletes:
+                cursor.executemany(f"DELETE FROM {safe_table_name} WHERE {safe_key_column} = ?",
+                                   [(self._to_sql_value(key),) for key in deletes])
+
+            for row in inserts:
+                columns = list(row.keys())
+                safe_columns = [self._sanitize_column_name(col) for col in columns]
+                placeholders = ', '.join(['?' for _ in columns])
+                cursor.execute(f"INSERT INTO {safe_table_name} ({', '.join(safe_columns)}) VALUES ({placeholders})",
+                               [self._to_sql_value(row[col]) for col in columns])
+
+            self.connection.commit()
+
+            logging.info(f"Applied changes to {safe_table_name}: {len(updates)} updated, {len(inserts)} inserted, {len(deletes)} deleted")
+            return True
+
+        except Exception as e:
+            self.connection.rollback()
+            logging.error(f"Error applying row changes to {table_name}: {str(e)}")
+            return False
+
+    def set_column_value(self, table_name: str, column: str, value: Any, key_column: str, keys: List[Any]) -> Optional[int]:
+        """Set one column to the same value for all rows with the given keys in one transaction.
+        Returns the number of matched rows, or None on error."""
+        try:
+            if not self.connection:
+                return None
+            
+            safe_table_name = self._sanitize_table_name(table_name)
+            safe_column = self._sanitize_column_name(column)
+            safe_key_column = self._sanitize_column_name(key_column)
+            cursor = self.connection.cursor()
+            # One statement per key keeps the lookups on the key index and avoids the bound-parameter limit of IN (...)
+            cursor.executemany(f"UPDATE {safe_table_name} SET {safe_column} = ? WHERE {safe_key_column} = ?",
+                               [(self._to_sql_value(value), self._to_sql_value(key)) for key in keys])
+            self.connection.commit()
+            
+            logging.info(f"Set {safe_column} on {cursor.rowcount} rows of {safe_table_name}")
+            return cursor.rowcount
+        
+        except Exception as e:
+            self.connection.rollback()
+            logging.error(f"Error setting {column} in table {table_name}: {str(e)}")
+            return None
+
     def get_table_info(self, table_name: str) -> Dict[str, Any]:
         """Get information about a table structure"""
         try:
@@ -172,35 +355,86 @@ class DatabaseManager:
         except Exception as e:
             logging.error(f"Error getting table info for {table_name}: {str(e)}")
             return {}
-    
+
+    def get_data_version(self) -> Optional[tuple]:
+        """Get a token that changes whenever the database content changes (used as cache key)"""
+        try:
+            if not self.connection or not os.path.exists(self.db_path):
+                return None
+
+            # total_changes covers writes through this connection, the file stats cover everything else.
+            # In WAL mode commits land in the -wal file first, so stat that as well.
+            stat = os.stat(self.db_path)
+            version = (self.db_path, self.connection.total_changes, stat.st_mtime_ns, stat.st_size)
+            wal_path = f"{self.db_path}-wal"
+            if os.path.exists(wal_path):
+                wal_stat = os.stat(wal_path)
+                version += (wal_stat.st_mtime_ns, wal_stat.st_size)
+            return version
+
+        except Exception as e:
+            logging.error(f"Error getting data version: {str(e)}")
+            return None
+
+    def export_database_file(self, target_path: Optional[str] = None) -> Optional[str]:
+        """Write a consistent copy of the database to a file and return its path.
+        If no target path is given, a new temporary file is created."""
+        try:
+            if not self.connection:
+                return None
+
+            if target_path is None:
+                # Create a temporary file database
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as tmp_file:
+                    target_path = tmp_file.name
+            elif os.path.exists(target_path):
+                # VACUUM INTO only writes to a new or empty file, replace any previous copy
+                os.unlink(target_path)
+
+            # Write a compacted copy (without free pages) in one statement; the copy is a
+            # self-contained rollback-journal database rather than one that expects a -wal sidecar
+            self.connection.execute("VACUUM INTO ?", (target_path,))
+
+            return target_path
+
+        except Exception as e:
+            logging.error(f"Error exporting database file: {str(e)}")
+            return None
+
     def get_database_content(self) -> Optional[bytes]:
         """Get the entire database as bytes for download"""
         try:
             if not self.connection:
                 return None
             
-            # Create a temporary file database
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as tmp_file:
-                temp_db_path = tmp_file.name
-            
-            # Copy in-memory database to file
-            file_db = sqlite3.connect(temp_db_path)
-            self.connection.backup(file_db)
-            file_db.close()
-            
-            # Read the file content
-            with open(temp_db_path, 'rb') as f:
-                content = f.read()
-            
-            # Clean up
-            os.unlink(temp_db_path)
-            
-            return content
+            # Serialize straight from the connection instead of exporting to a temporary file and reading it back
+            content = bytearray(self.connection.serialize())
+            # Mark the copy as a rollback-journal database (file format read/write versions at offsets 18-19),
+            # a WAL database image cannot be opened without its -wal file
+            content[18:20] = b'\x01\x01'
+            return bytes(content)
         
         except Exception as e:
             logging.error(f"Error getting database content: {str(e)}")
             return None
     
+    def analyze(self, table_name: Optional[str] = None) -> bool:
+        """Refresh the query planner statistics (of one table) so it picks the right indexes after bulk loads"""
+        try:
+            if not self.connection:
+                return False
+            
+            if table_name:
+                self.connection.execute(f"ANALYZE {self._sanitize_table_name(table_name)}")
+            else:
+                self.connection.execute("ANALYZE")
+            self.connection.commit()
+            return True
+        
+        except Exception as e:
+            logging.error(f"Error analyzing database: {str(e)}")
+            return False
+    
     def execute_query(self, query: str) -> pd.DataFrame:
         """Execute a custom SQL query and return results as DataFrame"""
         try:
@@ -214,19 +448,62 @@ class DatabaseManager:
             logging.error(f"Error executing query: {str(e)}")
             return pd.DataFrame()
     
-    def _sanitize_table_name(self, table_name: str) -> str:
-        """Sanitize table name to prevent SQL injection"""
+    def _build_where_clause(self, where: Optional[Dict[str, Any]], contains: Optional[Dict[str, str]]) -> tuple:
+        """Build a parameterized WHERE clause from exact-match and contains filters"""
+        conditions = []
+        params = []
+
+        for col, value in (where or {}).items():
+            safe_col_name = self._sanitize_column_name(col)
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            # numpy scalars (e.g. from DataFrame.unique()) can't be bound by sqlite3
+            values = [v.item() if hasattr(v, 'item') else v for v in values]
+            non_null = [v for v in values if not pd.isna(v)]
+            parts = []
+            if non_null:
+                parts.append(f"{safe_col_name} IN ({', '.join(['?' for _ in non_null])})")
+                params.extend(non_null)
+            if len(non_null) < len(values):
+                parts.append(f"{safe_col_name} IS NULL")
+            # An empty list of values matches nothing
+            conditions.append(f"({' OR '.join(parts)})" if parts else "0")
+
+        for col, text in (contains or {}).items():
+            safe_col_name = self._sanitize_column_name(col)
+            conditions.append(f"instr(casefold(CAST({safe_col_name} AS TEXT)), casefold(?)) > 0")
+            params.append(str(text))
+
+        if not conditions:
+            return "", params
+        return " WHERE " + " AND ".join(conditions), params
+
+    def _to_sql_value(self, value: Any) -> Any:
+        """Convert pandas/numpy values to something sqlite3 can bind"""
+        if isinstance(value, (list, dict, tuple)):
+            return str(value)
+        if pd.isna(value):
+            return None
+        if hasattr(value, 'item'):
+            return value.item()
+        return value
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _sanitize_table_name(table_name: str) -> str:
+        """Sanitize table name to prevent SQL injection (memoized, the same few names recur on every call)"""
         # Remove or replace invalid characters
-        sanitized = ''.join(c for c in table_name if c.isalnum() or c in '_')
+        sanitized = INVALID_NAME_CHARS.sub('', table_name)
         # Ensure it starts with a letter or underscore
         if sanitized and not (sanitized[0].isalpha() or sanitized[0] == '_'):
             sanitized = f"tbl_{sanitized}"
         return sanitized or "unknown_table"
     
-    def _sanitize_column_name(self, column_name: str) -> str:
-        """Sanitize column name to prevent SQL injection"""
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _sanitize_column_name(column_name: str) -> str:
+        """Sanitize column name to prevent SQL injection (memoized, the same few names recur on every call)"""
         # Remove or replace invalid characters
-        sanitized = ''.join(c for c in column_name if c.isalnum() or c in '_')
+        sanitized = INVALID_NAME_CHARS.sub('', column_name)
         # Ensure it starts with a letter or underscore
         if sanitized and not (sanitized[0].isalpha() or sanitized[0] == '_'):
             sanitized = f"col_{sanitized}"
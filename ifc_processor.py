@@ -1,11 +1,32 @@
 import ifcopenshell
-import sqlite3
+import ifcopenshell.api.pset
 import tempfile
 import os
-from typing import Optional, Dict, Any
+import re
+from typing import Optional, Dict, Any, List
 import logging
 from datetime import datetime
 
+# ISO 8601 time_stamp of the IFC FILE_NAME header (e.g. 2022-06-24T12:04:11+02:00), date part captured
+TIMESTAMP_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})T\d{2}:\d{2}:\d{2}')
+
+# Attribute value types that _entity_to_row stores without conversion
+PLAIN_VALUE_TYPES = frozenset({str, int, float, bool, type(None)})
+# Indexes of the ifc_objects table; IfcGuid needs none of its own, its UNIQUE constraint comes with an index
+IFC_OBJECTS_INDEX_DDL = """
+-- Serves the per-file lookups during loading and the file/status filters of the table view
+CREATE INDEX IF NOT EXISTS idx_ifc_objects_filename_status ON ifc_objects (Filename, Status);
+-- Serves the status filter on its own and purging the deleted objects
+CREATE INDEX IF NOT EXISTS idx_ifc_objects_status ON ifc_objects (Status);
+"""
+# The ifc_objects table as per your schema, with BuildingStorey after filename
+IFC_OBJECTS_DDL = """
+CREATE TABLE IF NOT EXISTS ifc_objects
+    (IfcGuid TEXT UNIQUE, Filename TEXT, BuildingStorey TEXT, Status TEXT DEFAULT 'active',
+     ArchitectApproval BOOLEAN DEFAULT FALSE, StructuralApproval BOOLEAN DEFAULT FALSE,
+     added_date TEXT, deleted_date TEXT);
+""" + IFC_OBJECTS_INDEX_DDL
+
 class IFCProcessor:
     def coerce_approval_columns_to_bool(self, df):
         """Ensure ArchitectApproval and StructuralApproval columns are true booleans for Streamlit checkboxes."""
@@ -19,94 +40,153 @@ class IFCProcessor:
         """Initialize the IFC processor with a file path"""
         self.ifc_file_path = ifc_file_path
         self.ifc_model = None
-        self.temp_ifc_path = None
+        self._written_approvals = {}  # GlobalId -> (pset name, properties) last written to the model
+        self._entities_by_guid = None  # GlobalId -> entity of the model, built on first write-back
+        self._storey_cache = {}  # Step id of a spatial element -> (storey found, storey name), see _find_storey
         self._load_ifc_model()
     
     def _load_ifc_model(self):
         """Load the IFC model from file"""
         try:
+            self._advise_sequential_read(self.ifc_file_path)
             self.ifc_model = ifcopenshell.open(self.ifc_file_path)
             logging.info(f"Successfully loaded IFC model from {self.ifc_file_path}")
         except Exception as e:
             logging.error(f"Failed to load IFC model: {str(e)}")
             raise Exception(f"Cannot open IFC file: {str(e)}")
     
+    @staticmethod
+    def _advise_sequential_read(file_path):
+        """Tell the kernel that the file is about to be read sequentially, so it reads ahead (POSIX only, a hint)"""
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logging.debug(f"Could not advise sequential read of {file_path}: {str(e)}")
+
     def load_ifc_to_database(self, db_manager, element_type: str = "IfcVirtualElement", original_filename: str = None, reset_database: bool = False) -> bool:
         """Extract IFC data and load it into SQLite database using your specific workflow. If reset_database is True, clears the ifc_objects table first."""
         try:
             if not self.ifc_model:
                 return False
 
-            # Always create the main tracking table based on your schema
-            self._create_ifc_objects_table(db_manager)
-
-            # If requested, clear the ifc_objects table for a fresh start
-            if reset_database:
-                self._clear_ifc_objects_table(db_manager)
-
             # Use the original filename if provided, otherwise extract from path
             if original_filename:
                 ifc_filename = original_filename
             else:
                 ifc_filename = os.path.basename(self.ifc_file_path)
 
-            ifc_creation_date = self._extract_creation_date()
+            ifc_creation_date, objects = self.extract_objects(element_type)
+            return self.store_objects(db_manager, ifc_filename, ifc_creation_date, objects, reset_database)
+
+        except Exception as e:
+            logging.error(f"Error loading IFC to database: {str(e)}")
+            return False
+
+    def extract_objects(self, element_type: str = "IfcVirtualElement") -> tuple:
+        """Extract the (GlobalId, BuildingStorey name) of all elements of element_type, with the creation date of the file.
+        Only uses the model, not the database, so it can also run in a worker process (see extract_ifc_file)."""
+        elements = self.ifc_model.by_type(element_type)
+        if not elements:
+            logging.warning(f"No {element_type} found in the IFC file")
+
+        objects = [(element.GlobalId, self._get_building_storey_name(element)) for element in elements]
+
+        return self._extract_creation_date(), objects
+
+    @classmethod
+    def store_objects(cls, db_manager, ifc_filename: str, ifc_creation_date: Optional[str], objects: list,
+                      reset_database: bool = False) -> bool:
+        """Merge the objects extracted from an IFC file (see extract_objects) into the ifc_objects table.
+        Objects of the file that are missing now are marked as deleted. If reset_database is True, clears the table first."""
+        try:
+            # Always create the main tracking table based on your schema
+            cls._create_ifc_objects_table(db_manager)
 
-            # Extract elements of the specified type
-            elements = self.ifc_model.by_type(element_type)
+            # If requested, clear the ifc_objects table for a fresh start
+            if reset_database:
+                cls._clear_ifc_objects_table(db_manager)
 
-            if not elements:
-                logging.warning(f"No {element_type} found in the IFC file")
+            if not objects:
                 # Still create empty tables for consistency
+                db_manager.connection.commit()
                 return True
 
             # Process the elements using your workflow
-            result = self._process_elements(elements, ifc_filename, ifc_creation_date, db_manager, element_type)
+            result = cls._merge_objects(objects, ifc_filename, ifc_creation_date, db_manager)
+            if not result:
+                # Also undoes the reset, the database keeps its previous content
+                db_manager.connection.rollback()
+                return False
 
-            # After processing, ensure approval columns are boolean
-            import pandas as pd
-            try:
-                df = db_manager.get_table_data('ifc_objects')
-                changed = False
-                for col in ['ArchitectApproval', 'StructuralApproval']:
-                    if col in df.columns and df[col].dtype != bool:
-                        # Accept 1/0, 'True'/'False', True/False, etc.
-                        df[col] = df[col].apply(lambda v: True if (v is True or v == 1 or (isinstance(v, str) and v.strip().lower() == 'true')) else False)
-                        changed = True
-                if changed:
-                    db_manager.update_table_data('ifc_objects', df)
-            except Exception as e:
-                logging.warning(f"Could not coerce approval columns to boolean: {str(e)}")
+            # After processing, ensure approval columns are stored as 0/1
+            cls._normalize_approval_columns(db_manager)
+
+            # The reset, the new/deleted objects and the normalization are committed as one transaction
+            db_manager.connection.commit()
 
+            # Let the query planner know about the new rows for the IfcGuid and Filename/Status indexes
+            db_manager.analyze('ifc_objects')
             return result
 
         except Exception as e:
-            logging.error(f"Error loading IFC to database: {str(e)}")
+            db_manager.connection.rollback()
+            logging.error(f"Error storing IFC objects in database: {str(e)}")
             return False
-    def _clear_ifc_objects_table(self, db_manager):
-        """Delete all rows from the ifc_objects table to ensure a fresh start."""
+
+    @staticmethod
+    def _normalize_approval_columns(db_manager):
+        """Store the approval columns as 0/1 in place (older databases may hold 'True'/'False' text or NULL), committed by the caller"""
+        try:
+            connection = db_manager.connection
+            cursor = connection.cursor()
+            for col in ['ArchitectApproval', 'StructuralApproval']:
+                # Only rows that aren't 0/1 yet are rewritten, instead of reloading the whole table
+                cursor.execute(f"""UPDATE ifc_objects
+                                   SET {col} = COALESCE(LOWER(TRIM(CAST({col} AS TEXT))) IN ('1', '1.0', 'true'), 0)
+                                   WHERE {col} IS NULL OR typeof({col}) != 'integer' OR {col} NOT IN (0, 1)""")
+        except Exception as e:
+            logging.warning(f"Could not coerce approval columns to boolean: {str(e)}")
+
+    @staticmethod
+    def _clear_ifc_objects_table(db_manager):
+        """Delete all rows from the ifc_objects table to ensure a fresh start (committed by the caller)."""
         try:
             connection = db_manager.connection
             cursor = connection.cursor()
             cursor.execute('DELETE FROM ifc_objects')
-            connection.commit()
             logging.info("Cleared all rows from ifc_objects table (fresh start)")
         except Exception as e:
             logging.error(f"Error clearing ifc_objects table: {str(e)}")
     
-    def _create_ifc_objects_table(self, db_manager):
+    @staticmethod
+    def _create_ifc_objects_table(db_manager):
         """Create the ifc_objects table as per your schema, with BuildingStorey after filename"""
         try:
-            connection = db_manager.connection
-            cursor = connection.cursor()
-            cursor.execute('''CREATE TABLE IF NOT EXISTS ifc_objects
-                             (IfcGuid TEXT UNIQUE, Filename TEXT, BuildingStorey TEXT, Status TEXT DEFAULT 'active',
-                              ArchitectApproval BOOLEAN DEFAULT FALSE, StructuralApproval BOOLEAN DEFAULT FALSE,
-                              added_date TEXT, deleted_date TEXT)''')
-            connection.commit()
+            # The table and its indexes in one script (executescript runs outside a transaction, no commit needed)
+            db_manager.connection.executescript(IFC_OBJECTS_DDL)
             logging.info("Created ifc_objects table (BuildingStorey after filename)")
         except Exception as e:
             logging.error(f"Error creating ifc_objects table: {str(e)}")
+
+    @staticmethod
+    def create_ifc_objects_indexes(db_manager):
+        """Create the indexes of the ifc_objects table if it exists (also for databases created elsewhere, e.g. uploaded ones)."""
+        try:
+            connection = db_manager.connection
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ifc_objects'")
+            if cursor.fetchone() is None:
+                return
+            connection.executescript(IFC_OBJECTS_INDEX_DDL)
+        except Exception as e:
+            logging.warning(f"Could not create ifc_objects indexes: {str(e)}")
     
     def _extract_creation_date(self) -> Optional[str]:
         """Extract creation date from IFC FILE_NAME header"""
@@ -114,16 +194,15 @@ class IFCProcessor:
             ifc_header = self.ifc_model.header
             if ifc_header and hasattr(ifc_header, 'file_name') and hasattr(ifc_header.file_name, 'time_stamp'):
                 timestamp_str = str(ifc_header.file_name.time_stamp)
-                try:
-                    # Parse various datetime formats, handle timezone info
-                    datetime_part = timestamp_str.split('+')[0].split('.')[0]
-                    timestamp_obj = datetime.strptime(datetime_part, '%Y-%m-%dT%H:%M:%S')
-                    creation_date = timestamp_obj.strftime('%y%m%d')
-                    logging.info(f"Found creation date in FILE_NAME header: {creation_date}")
-                    return creation_date
-                except ValueError:
+                # Only the date is kept (YYMMDD); fractional seconds and timezone info are ignored
+                match = TIMESTAMP_PATTERN.match(timestamp_str)
+                if not match:
                     logging.warning(f"Could not parse timestamp format from FILE_NAME: {timestamp_str}")
                     return None
+                year, month, day = match.groups()
+                creation_date = f"{year[2:]}{month}{day}"
+                logging.info(f"Found creation date in FILE_NAME header: {creation_date}")
+                return creation_date
             else:
                 logging.warning("FILE_NAME header or time_stamp not found")
                 return None
@@ -131,112 +210,90 @@ class IFCProcessor:
             logging.error(f"Error extracting creation date: {str(e)}")
             return None
     
-    def _process_elements(self, elements, ifc_filename, ifc_creation_date, db_manager, element_type: str) -> bool:
-        """Process IFC elements using your workflow, now extracting BuildingStorey (after filename)"""
+    @staticmethod
+    def _merge_objects(objects, ifc_filename, ifc_creation_date, db_manager) -> bool:
+        """Add the new objects of an IFC file to the database and mark its objects that are gone as deleted"""
         try:
             connection = db_manager.connection
             cursor = connection.cursor()
 
-            # Extract data from elements, including BuildingStorey after filename
-
-            updated_extracted_data = []
-            for element in elements:
-                storey_name = self._get_building_storey_name(element)
-                updated_extracted_data.append((element.GlobalId, ifc_filename, storey_name))
-
-            # Create set of GUIDs for efficient lookup
-            updated_guids = set([item[0] for item in updated_extracted_data])
-
-            # Query existing data from database
-            existing_data = {}
-            cursor.execute("SELECT IfcGuid, Status FROM ifc_objects WHERE Filename = ?", (ifc_filename,))
-            for row in cursor.fetchall():
-                existing_data[row[0]] = row[1]
-
-            logging.info(f"Found {len(existing_data)} existing objects in database for filename '{ifc_filename}'")
+            timestamp = ifc_creation_date if ifc_creation_date else datetime.now().strftime('%y%m%d')
 
-            # Mark deleted objects
-            if existing_data:
-                deleted_guids = []
-                deletion_timestamp = ifc_creation_date if ifc_creation_date else datetime.now().strftime('%y%m%d')
+            # Load the objects of the file into a temporary table and compare them with the stored ones in SQL
+            # (first occurrence wins for duplicate GUIDs); NOT EXISTS instead of NOT IN, as a single NULL
+            # IfcGuid (e.g. from an uploaded database) would make NOT IN match no row at all
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS current_objects (IfcGuid TEXT PRIMARY KEY, BuildingStorey TEXT)")
+            cursor.execute("DELETE FROM current_objects")
+            cursor.executemany("INSERT OR IGNORE INTO current_objects (IfcGuid, BuildingStorey) VALUES (?, ?)", objects)
 
-                for guid, status in existing_data.items():
-                    if guid not in updated_guids and status == 'active':
-                        deleted_guids.append(guid)
+            # Mark the active objects of the file that are gone as deleted
+            cursor.execute("""UPDATE ifc_objects SET Status = 'deleted', deleted_date = ?
+                              WHERE Filename = ? AND Status = 'active'
+                              AND NOT EXISTS (SELECT 1 FROM current_objects c WHERE c.IfcGuid = ifc_objects.IfcGuid)""",
+                           (timestamp, ifc_filename))
+            if cursor.rowcount > 0:
+                logging.info(f"Marked {cursor.rowcount} objects as 'deleted'")
 
-                if deleted_guids:
-                    cursor.executemany('UPDATE ifc_objects SET Status = "deleted", deleted_date = ? WHERE IfcGuid = ?',
-                                     [(deletion_timestamp, guid) for guid in deleted_guids])
-                    logging.info(f"Marked {len(deleted_guids)} objects as 'deleted'")
+            # Add the objects that the file didn't have before (INSERT OR IGNORE skips GUIDs stored for other files)
+            cursor.execute("""INSERT OR IGNORE INTO ifc_objects (IfcGuid, Filename, BuildingStorey, Status, ArchitectApproval,
+                                                                 StructuralApproval, added_date, deleted_date)
+                              SELECT IfcGuid, ?, BuildingStorey, 'active', FALSE, FALSE, ?, NULL FROM current_objects
+                              WHERE NOT EXISTS (SELECT 1 FROM ifc_objects o
+                                                WHERE o.Filename = ? AND o.IfcGuid = current_objects.IfcGuid)""",
+                           (ifc_filename, timestamp, ifc_filename))
+            if cursor.rowcount > 0:
+                logging.info(f"Added {cursor.rowcount} new objects to database (BuildingStorey after filename, using INSERT OR IGNORE for unique GUIDs)")
 
-            # Add new objects
-            existing_guids_set = set(existing_data.keys())
-            new_objects_to_add = []
-            added_timestamp = ifc_creation_date if ifc_creation_date else datetime.now().strftime('%y%m%d')
+            cursor.execute("DELETE FROM current_objects")
 
-            for guid, filename, storey_name in updated_extracted_data:
-                if guid not in existing_guids_set:
-                    new_objects_to_add.append((guid, filename, storey_name, 'active', False, False, added_timestamp, None))
-
-            if new_objects_to_add:
-                cursor.executemany('INSERT OR IGNORE INTO ifc_objects (IfcGuid, Filename, BuildingStorey, Status, ArchitectApproval, StructuralApproval, added_date, deleted_date) VALUES (?,?,?,?,?,?,?,?)', new_objects_to_add)
-                logging.info(f"Added {len(new_objects_to_add)} new objects to database (BuildingStorey after filename, using INSERT OR IGNORE for unique GUIDs)")
-
-            connection.commit()
             return True
 
         except Exception as e:
-            logging.error(f"Error processing virtual elements: {str(e)}")
+            logging.error(f"Error merging objects of {ifc_filename}: {str(e)}")
             return False
 
     def _get_building_storey_name(self, element):
         """Find the building storey name for a given IFC element (returns name or None)"""
         try:
+            # Inverse attributes are tuples of relationships (empty if there are none)
             # Try spatial containment first (IfcRelContainedInSpatialStructure)
-            if hasattr(element, 'ContainedInStructure') and element.ContainedInStructure:
-                rels = element.ContainedInStructure
-                if not isinstance(rels, (list, tuple)):
-                    rels = [rels]
-                for rel in rels:
-                    if hasattr(rel, 'RelatingStructure'):
-                        struct = rel.RelatingStructure
-                        # Walk up the spatial structure tree
-                        while struct:
-                            if struct.is_a('IfcBuildingStorey'):
-                                return getattr(struct, 'Name', None)
-                            # Go up to parent spatial structure
-                            if hasattr(struct, 'Decomposes') and struct.Decomposes:
-                                parent_rel = struct.Decomposes[0] if isinstance(struct.Decomposes, list) else struct.Decomposes
-                                if hasattr(parent_rel, 'RelatingObject'):
-                                    struct = parent_rel.RelatingObject
-                                else:
-                                    break
-                            else:
-                                break
+            for rel in getattr(element, 'ContainedInStructure', None) or ():
+                if hasattr(rel, 'RelatingStructure'):
+                    found, name = self._find_storey(rel.RelatingStructure)
+                    if found:
+                        return name
             # Try decomposition (for elements that are part of an aggregate)
-            if hasattr(element, 'Decomposes') and element.Decomposes:
-                rels = element.Decomposes
-                if not isinstance(rels, (list, tuple)):
-                    rels = [rels]
-                for rel in rels:
-                    if hasattr(rel, 'RelatingObject'):
-                        parent = rel.RelatingObject
-                        # Walk up the decomposition tree
-                        while parent:
-                            if parent.is_a('IfcBuildingStorey'):
-                                return getattr(parent, 'Name', None)
-                            if hasattr(parent, 'Decomposes') and parent.Decomposes:
-                                parent_rel = parent.Decomposes[0] if isinstance(parent.Decomposes, list) else parent.Decomposes
-                                if hasattr(parent_rel, 'RelatingObject'):
-                                    parent = parent_rel.RelatingObject
-                                else:
-                                    break
-                            else:
-                                break
+            for rel in getattr(element, 'Decomposes', None) or ():
+                if hasattr(rel, 'RelatingObject'):
+                    found, name = self._find_storey(rel.RelatingObject)
+                    if found:
+                        return name
             return None
         except Exception as e:
             logging.warning(f"Could not extract building storey: {str(e)}")
             return None
+
+    def _find_storey(self, struct):
+        """Walk up the spatial structure tree from struct to a building storey.
+        Returns (found, storey name); memoized per start entity, as many elements share the same container."""
+        if not struct:
+            return False, None
+        key = struct.id()
+        if key not in self._storey_cache:
+            result = (False, None)
+            while struct:
+                if struct.is_a('IfcBuildingStorey'):
+                    result = (True, getattr(struct, 'Name', None))
+                    break
+                # Go up to parent spatial structure (Decomposes is a tuple of IfcRelAggregates)
+                parent = None
+                for rel in getattr(struct, 'Decomposes', None) or ():
+                    if hasattr(rel, 'RelatingObject'):
+                        parent = rel.RelatingObject
+                        break
+                struct = parent
+            self._storey_cache[key] = result
+        return self._storey_cache[key]
     
     def _process_entity_group(self, entity_type: str, entities: list, db_manager):
         """Process a group of entities of the same type"""
@@ -244,29 +301,23 @@ class IFCProcessor:
             if not entities:
                 return
             
-            # Extract properties from the first entity to determine table structure
-            sample_entity = entities[0]
-            columns = self._extract_entity_properties(sample_entity)
+            # Reflect every entity once and reuse the attributes for the table structure and the rows
+            infos = [entity.get_info() for entity in entities]
+            # Determine the table structure from the attributes of all entities, not just the first one
+            columns = self._extract_entity_properties(entities[0], infos)
             
             # Create table
             db_manager.create_table(entity_type, columns)
             
-            # Insert all entities
-            rows = []
-            for entity in entities:
-                row_data = self._entity_to_row(entity, columns)
-                if row_data:
-                    rows.append(row_data)
-            
-            if rows:
-                db_manager.insert_rows(entity_type, columns, rows)
-                logging.info(f"Inserted {len(rows)} rows into {entity_type} table")
+            # Insert all entities; the rows are generated while inserting instead of being collected in a list first
+            rows = (self._entity_to_row(entity, columns, info) for entity, info in zip(entities, infos))
+            db_manager.insert_rows(entity_type, columns, (row for row in rows if row))
         
         except Exception as e:
             logging.error(f"Error processing entity group {entity_type}: {str(e)}")
     
-    def _extract_entity_properties(self, entity) -> Dict[str, str]:
-        """Extract property names and types from an entity"""
+    def _extract_entity_properties(self, entity, infos: Optional[List[Dict[str, Any]]] = None) -> Dict[str, str]:
+        """Extract property names and types from an entity, or from the get_info() dicts of several entities"""
         columns = {
             'GlobalId': 'TEXT PRIMARY KEY',
             'EntityType': 'TEXT',
@@ -275,28 +326,31 @@ class IFCProcessor:
         }
         
         try:
+            if infos is None:
+                infos = [entity.get_info()]
+            
             # Add standard IFC properties
-            if hasattr(entity, 'OwnerHistory'):
+            if any('OwnerHistory' in info for info in infos):
                 columns['OwnerHistory'] = 'TEXT'
             
             # Add entity-specific attributes
-            info = entity.get_info()
-            for key, value in info.items():
-                if key not in columns:
-                    if isinstance(value, (int, float)):
-                        columns[key] = 'REAL'
-                    elif isinstance(value, bool):
-                        columns[key] = 'INTEGER'
-                    else:
-                        columns[key] = 'TEXT'
+            for info in infos:
+                for key, value in info.items():
+                    if key not in columns:
+                        if isinstance(value, (int, float)):
+                            columns[key] = 'REAL'
+                        elif isinstance(value, bool):
+                            columns[key] = 'INTEGER'
+                        else:
+                            columns[key] = 'TEXT'
         
         except Exception as e:
             logging.warning(f"Error extracting properties from entity: {str(e)}")
         
         return columns
     
-    def _entity_to_row(self, entity, columns: Dict[str, str]) -> Optional[Dict[str, Any]]:
-        """Convert an IFC entity to a database row"""
+    def _entity_to_row(self, entity, columns: Dict[str, str], info: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Convert an IFC entity to a database row (info is its get_info() dict, if already read)"""
         try:
             row = {}
             
@@ -307,20 +361,21 @@ class IFCProcessor:
             row['Description'] = getattr(entity, 'Description', None)
             
             # Additional attributes
-            info = entity.get_info()
-            for column_name in columns.keys():
-                if column_name not in row:
-                    value = info.get(column_name)
-                    if value is not None:
-                        # Convert complex objects to string representation
-                        if hasattr(value, 'is_a'):  # IFC entity reference
-                            row[column_name] = f"{value.is_a()}({getattr(value, 'GlobalId', str(value.id()))})"
-                        elif isinstance(value, (list, tuple)):
-                            row[column_name] = str(value)
-                        else:
-                            row[column_name] = value
+            if info is None:
+                info = entity.get_info()
+            # (columns the entity doesn't have are left out, insert_rows stores them as NULL)
+            for column_name, value in info.items():
+                if column_name in columns and column_name not in row:
+                    # Most values are plain scalars, a single type lookup stores them as they are
+                    if type(value) in PLAIN_VALUE_TYPES:
+                        row[column_name] = value
+                    # Convert complex objects to string representation
+                    elif hasattr(value, 'is_a'):  # IFC entity reference
+                        row[column_name] = f"{value.is_a()}({getattr(value, 'GlobalId', str(value.id()))})"
+                    elif isinstance(value, (list, tuple)):
+                        row[column_name] = str(value)
                     else:
-                        row[column_name] = None
+                        row[column_name] = value
             
             return row
         
@@ -347,6 +402,11 @@ class IFCProcessor:
                     param_arch = param_arch or 'ApprovalArchitect'
                     param_struct = param_struct or 'ApprovalStructure'
 
+            # The database holds the objects of all uploaded files, only this model's GUIDs can be written
+            # (indexed once so the rows are resolved with a dict lookup instead of a by_guid call each)
+            if self._entities_by_guid is None:
+                self._entities_by_guid = {entity.GlobalId: entity for entity in self.ifc_model.by_type('IfcRoot')}
+
             tables = db_manager.get_tables()
             for table_name in tables:
                 self._update_entities_from_table(table_name, db_manager, pset_name, param_arch, param_struct)
@@ -358,74 +418,74 @@ class IFCProcessor:
     def _update_entities_from_table(self, table_name: str, db_manager, pset_name, param_arch, param_struct):
         """Update entities of a specific type from database table, writing to user-selected Pset/param names."""
         try:
-            df = db_manager.get_table_data(table_name)
-            if df.empty:
+            # Only the GUID and approval columns are needed, read them as plain lists instead of a DataFrame
+            columns = db_manager.get_column_values(table_name, ['IfcGuid', 'GlobalId', 'ArchitectApproval', 'StructuralApproval'])
+            # Use IfcGuid for main table, fallback to GlobalId for others
+            guid_column = next((col for col in ('IfcGuid', 'GlobalId') if col in columns), None)
+            if guid_column is None or not columns[guid_column]:
                 return
-            for _, row in df.iterrows():
-                # Use IfcGuid for main table, fallback to GlobalId for others
-                global_id = row.get('IfcGuid') or row.get('GlobalId')
-                if not global_id:
+            approval_values = {}
+            if param_arch and 'ArchitectApproval' in columns:
+                approval_values[param_arch] = columns['ArchitectApproval']
+            if param_struct and 'StructuralApproval' in columns:
+                approval_values[param_struct] = columns['StructuralApproval']
+            param_names = list(approval_values)
+            for global_id, *values in zip(columns[guid_column], *approval_values.values()):
+                entity = self._entities_by_guid.get(global_id)
+                if entity is None:
                     continue
-                try:
-                    # Always use by_guid, which returns a list or single entity
-                    entities = self.ifc_model.by_guid(global_id)
-                    if not entities:
-                        logging.warning(f"No IFC entity found for GUID: {global_id}")
-                        continue
-                    # If it's a list, update all; if single, wrap in list
-                    if not isinstance(entities, (list, tuple)):
-                        entities = [entities]
-                    for entity in entities:
-                        # Write to Pset/param as selected by user (never write back status)
-                        try:
-                            # Always create Pset if missing
-                            try:
-                                import ifcopenshell.api
-                                # Always use ifcopenshell.api to add the Pset robustly
-                                pset = ifcopenshell.api.run("pset.add_pset", self.ifc_model, product=entity, name=pset_name)
-                                properties_to_write = {}
-                                if param_arch and 'ArchitectApproval' in row:
-                                    properties_to_write[param_arch] = str(bool(row['ArchitectApproval']))
-                                if param_struct and 'StructuralApproval' in row:
-                                    properties_to_write[param_struct] = str(bool(row['StructuralApproval']))
-                                if properties_to_write and pset:
-                                    ifcopenshell.api.run("pset.edit_pset", self.ifc_model, pset=pset, properties=properties_to_write)
-                                    logging.info(f"Wrote approvals to entity {global_id} in Pset '{pset_name}' using ifcopenshell.api")
-                                else:
-                                    logging.warning(f"No approval properties to write or could not create/find Pset '{pset_name}' for entity {global_id}")
-                            except Exception as api_error:
-                                logging.warning(f"Could not write approvals to Pset for entity {global_id} using ifcopenshell.api: {str(api_error)}")
-                            else:
-                                logging.warning(f"Entity {global_id} has no get_psets method")
-                        except Exception as pset_error:
-                            logging.warning(f"Could not write to Pset for entity {global_id}: {str(pset_error)}")
-                except Exception as entity_error:
-                    logging.warning(f"Could not find/update entity {global_id}: {str(entity_error)}")
+                properties_to_write = {name: str(bool(value)) for name, value in zip(param_names, values)}
+                # The model stays loaded between downloads, only write what changed since the last write-back
+                written = (pset_name, tuple(sorted(properties_to_write.items())))
+                if self._written_approvals.get(global_id) == written:
                     continue
+                # Write to Pset/param as selected by user (never write back status)
+                try:
+                    # Call the pset API functions directly instead of dispatching through ifcopenshell.api.run;
+                    # add_pset returns the existing Pset of that name, or creates it
+                    pset = ifcopenshell.api.pset.add_pset(self.ifc_model, product=entity, name=pset_name)
+                    if properties_to_write and pset:
+                        ifcopenshell.api.pset.edit_pset(self.ifc_model, pset=pset, properties=properties_to_write)
+                        logging.info(f"Wrote approvals to entity {global_id} in Pset '{pset_name}' using ifcopenshell.api")
+                        # Only a successful write counts, failed ones are tried again on the next write-back
+                        self._written_approvals[global_id] = written
+                    else:
+                        logging.warning(f"No approval properties to write or could not create/find Pset '{pset_name}' for entity {global_id}")
+                except Exception as pset_error:
+                    logging.warning(f"Could not write approvals to Pset for entity {global_id} using ifcopenshell.api: {str(pset_error)}")
         except Exception as e:
             logging.error(f"Error updating entities from table {table_name}: {str(e)}")
     
-    def get_ifc_content(self) -> Optional[bytes]:
-        """Get the current IFC model content as bytes"""
+    def write_ifc_file(self, target_path: Optional[str] = None) -> Optional[str]:
+        """Write the current IFC model to a file and return its path.
+        If no target path is given, a new temporary file is created."""
+        temp_path = None
         try:
             if not self.ifc_model:
                 return None
             
-            # Create a temporary file to write the IFC content
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".ifc") as tmp_file:
-                self.temp_ifc_path = tmp_file.name
-            
-            # Write the model to the temporary file
-            self.ifc_model.write(self.temp_ifc_path)
-            
-            # Read the content
-            with open(self.temp_ifc_path, 'rb') as f:
-                content = f.read()
+            if target_path is None:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".ifc") as tmp_file:
+                    target_path = temp_path = tmp_file.name
             
-            # Clean up
-            os.unlink(self.temp_ifc_path)
+            self.ifc_model.write(target_path)
+            return target_path
+        
+        except Exception as e:
+            logging.error(f"Error writing IFC file: {str(e)}")
+            # Don't leave a half-written temporary file behind
+            if temp_path and os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return None
+    
+    def get_ifc_content(self) -> Optional[bytes]:
+        """Get the current IFC model content as bytes"""
+        try:
+            if not self.ifc_model:
+                return None
             
-            return content
+            # Serialize in memory instead of writing a temporary file and reading it back
+            return self.ifc_model.to_string().encode('utf-8')
         
         except Exception as e:
             logging.error(f"Error getting IFC content: {str(e)}")
@@ -437,18 +497,16 @@ class IFCProcessor:
             if not self.ifc_model:
                 return {}
             
-            info = {
+            # Count entities per type from the type index of the model (only the types present in the file),
+            # instead of walking every entity; the total follows from the counts
+            entity_types = {entity_type: len(self.ifc_model.by_type(entity_type, include_subtypes=False))
+                            for entity_type in self.ifc_model.types()}
+            
+            return {
                 'schema': self.ifc_model.schema,
-                'total_entities': len(list(self.ifc_model)),
-                'entity_types': {}
+                'total_entities': sum(entity_types.values()),
+                'entity_types': entity_types
             }
-            
-            # Count entities by type
-            for entity in self.ifc_model:
-                entity_type = entity.is_a()
-                info['entity_types'][entity_type] = info['entity_types'].get(entity_type, 0) + 1
-            
-            return info
         
         except Exception as e:
             logging.error(f"Error getting model info: {str(e)}")
@@ -459,8 +517,16 @@ class IFCProcessor:
         try:
             if db_manager.connection:
                 db_manager.connection.close()
-            db_manager.connection = sqlite3.connect(db_file_path)
+            # Reconnect through the database manager so the new connection gets the same pragmas (WAL, cache, mmap)
+            db_manager.db_path = db_file_path
+            db_manager._connect()
             logging.info(f"Database switched to {db_file_path}")
         except Exception as e:
             logging.error(f"Error switching database file: {str(e)}")
             raise
+
+
+def extract_ifc_file(ifc_file_path: str, element_type: str) -> tuple:
+    """Parse an IFC file and extract its objects of element_type (see IFCProcessor.extract_objects).
+    A module-level function, so it can run in a worker process; only the extracted rows are sent back."""
+    return IFCProcessor(ifc_file_path).extract_objects(element_type)
@@ -16,6 +16,11 @@ else:
 
 conn = sqlite3.connect(DB_PATH)
 cursor = conn.cursor()
+# One-shot copy with a backup: skip the fsyncs and keep temporary data in memory
+cursor.execute("PRAGMA synchronous=OFF")
+cursor.execute("PRAGMA temp_store=MEMORY")
+# Rename, create, copy and drop as one transaction, so an interrupted run leaves the table untouched
+cursor.execute("BEGIN")
 
 
 # 1. Rename old table (handle if already migrated or missing)
@@ -24,10 +29,12 @@ try:
 except sqlite3.OperationalError as e:
     if "no such table" in str(e):
         print("No ifc_objects table found. Nothing to migrate.")
+        conn.rollback()
         conn.close()
         exit(0)
     elif "already exists" in str(e):
         print("Migration already applied. Exiting.")
+        conn.rollback()
         conn.close()
         exit(0)
     else:
@@ -10,6 +10,11 @@ NEW_COLUMNS = [
 
 conn = sqlite3.connect(DB_PATH)
 cursor = conn.cursor()
+# One-shot copy: skip the fsyncs and keep temporary data in memory
+cursor.execute("PRAGMA synchronous=OFF")
+cursor.execute("PRAGMA temp_store=MEMORY")
+# Create, copy, drop and rename as one transaction, so an interrupted run leaves the table untouched
+cursor.execute("BEGIN")
 
 # 1. Create new table with correct column order
 cursor.execute('''CREATE TABLE IF NOT EXISTS ifc_objects_new (
@@ -33,7 +38,9 @@ select_expr = ', '.join([
     col if col in old_columns else 'NULL as ' + col for col in NEW_COLUMNS
 ])
 
-cursor.execute(f'INSERT INTO ifc_objects_new ({', '.join(NEW_COLUMNS)}) SELECT {select_expr} FROM ifc_objects')
+columns_sql = ', '.join(NEW_COLUMNS)
+
+cursor.execute(f"INSERT INTO ifc_objects_new ({columns_sql}) SELECT {select_expr} FROM ifc_objects")
 
 # 3. Drop old table and rename new table
 cursor.execute('DROP TABLE ifc_objects')